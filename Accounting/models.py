@@ -3,9 +3,11 @@ from django.utils.text import slugify
 from django.contrib.auth import get_user_model
 from property.models import Property
 import uuid
+from MBP.audit import audited
 
 User = get_user_model()
 
+@audited
 class Transaction(models.Model):
     TRANSACTION_TYPES = [
         ('Credit', 'Credit'),
@@ -30,6 +32,7 @@ class Transaction(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.transaction_type} - ₹{self.amount}"
 
+@audited
 class Invoice(models.Model):
     STATUS_CHOICES = [
         ('Pending', 'Pending'),
@@ -52,6 +55,7 @@ class Invoice(models.Model):
     def __str__(self):
         return f"Invoice #{self.id} - {self.user.username} - {self.status}"
 
+@audited
 class Receipt(models.Model):
     invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE)
     receipt_number = models.CharField(max_length=100)
@@ -69,6 +73,7 @@ class Receipt(models.Model):
     def __str__(self):
         return f"Receipt #{self.receipt_number}"
 
+@audited
 class Commission(models.Model):
     agent = models.ForeignKey(User, on_delete=models.CASCADE, related_name='commissions')
     amount = models.DecimalField(max_digits=12, decimal_places=2)
@@ -84,6 +89,7 @@ class Commission(models.Model):
     def __str__(self):
         return f"{self.agent.username} - Commission - ₹{self.amount}"
 
+@audited
 class RentReceipt(models.Model):
     PERIOD_CHOICES = [
         ("monthly", "Monthly"),
@@ -15,7 +15,7 @@ def update_agent_deals_from_transaction(sender, instance, **kwargs):
         # Auto mark property as sold if transaction successful
         if property_obj.property_status not in ["Sold", "Rented"]:
             property_obj.property_status = "Sold"
-            property_obj.save(update_fields=["property_status"])
+            property_obj.save(update_fields=["property_status", "last_updated"])
 
         if property_obj.agent:
             try:
@@ -24,7 +24,7 @@ def update_agent_deals_from_transaction(sender, instance, **kwargs):
                     agent=property_obj.agent, property_status__in=["Sold", "Rented"]
                 ).count()
                 agent_profile.deals_closed = closed_deals
-                agent_profile.save(update_fields=["deals_closed"])
+                agent_profile.save(update_fields=["deals_closed", "updated_at"])
             except AgentProfile.DoesNotExist:
                 pass
 
@@ -41,7 +41,7 @@ def update_agent_deals_from_commission(sender, instance, **kwargs):
                 agent=instance.agent, property_status__in=["Sold", "Rented"]
             ).count()
             agent_profile.deals_closed = closed_deals
-            agent_profile.save(update_fields=["deals_closed"])
+            agent_profile.save(update_fields=["deals_closed", "updated_at"])
         except AgentProfile.DoesNotExist:
             pass
 
@@ -65,7 +65,7 @@ def update_agent_earnings(sender, instance, **kwargs):
                 total=Sum("amount")
             )["total"] or 0
             agent_profile.total_earnings = total
-            agent_profile.save(update_fields=["total_earnings"])
+            agent_profile.save(update_fields=["total_earnings", "updated_at"])
         except AgentProfile.DoesNotExist:
             pass
 
@@ -94,6 +94,6 @@ def update_agent_deals_and_earnings_from_transaction(sender, instance, **kwargs)
                     )["total"] or 0
                     agent_profile.total_earnings = total
 
-                agent_profile.save(update_fields=["deals_closed", "total_earnings"])
+                agent_profile.save(update_fields=["deals_closed", "total_earnings", "updated_at"])
             except AgentProfile.DoesNotExist:
                 pass
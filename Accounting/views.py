@@ -1,7 +1,12 @@
 from .models import *
 from .serializers import *
 from MBP.views import ProtectedModelViewSet
+from MBP.utils import aggregate_buckets
 from rest_framework.decorators import action
+from rest_framework.response import Response
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils.timezone import now
 
 class TransactionViewSet(ProtectedModelViewSet):
     queryset = Transaction.objects.all().order_by('-timestamp')
@@ -11,12 +16,17 @@ class TransactionViewSet(ProtectedModelViewSet):
     
     @action(detail=False, methods=['get'], url_path='summary')
     def summary(self, request):
-        qs = self.get_queryset()
         current_month = now().month
+        totals = aggregate_buckets(
+            self.get_queryset(),
+            total_transactions=Q(),
+            total_amount=Sum('amount'),
+            this_month=Sum('amount', filter=Q(timestamp__month=current_month)),
+        )
         return Response({
-            'total_transactions': qs.count(),
-            'total_amount': qs.aggregate(Sum('amount'))['amount__sum'] or 0,
-            'this_month': qs.filter(timestamp__month=current_month).aggregate(Sum('amount'))['amount__sum'] or 0,
+            'total_transactions': totals['total_transactions'],
+            'total_amount': totals['total_amount'] or 0,
+            'this_month': totals['this_month'] or 0,
         })
     
     @action(detail=False, methods=['get'], url_path='monthly-revenue')
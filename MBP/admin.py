@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Role, AppModel, PermissionType, RoleModelPermission, AuditLog
+from .models import Role, AppModel, PermissionType, RoleModelPermission, AuditLog, StoredBlob
 
 @admin.register(Role)
 class RoleAdmin(admin.ModelAdmin):
@@ -38,4 +38,11 @@ class AuditLogAdmin(admin.ModelAdmin):
     list_display = ['timestamp', 'user', 'action', 'model_name', 'object_id']
     search_fields = ['user__email', 'action', 'model_name', 'details']
     list_filter = ['action', 'model_name', 'timestamp']
-    readonly_fields = [field.name for field in AuditLog._meta.fields]
\ No newline at end of file
+    readonly_fields = [field.name for field in AuditLog._meta.fields]
+
+@admin.register(StoredBlob)
+class StoredBlobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'size', 'references', 'private', 'created_at')
+    list_filter = ('private',)
+    search_fields = ('name',)
+    readonly_fields = ('name', 'size', 'references', 'private', 'created_at')
@@ -7,3 +7,4 @@ class MbpConfig(AppConfig):
 
     def ready(self):
         import MBP.signals
+        import MBP.checks
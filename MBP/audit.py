@@ -0,0 +1,180 @@
+import atexit
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+_audited_models = {}
+
+
+def audited(model=None, *, ignore_fields=()):
+    """
+    Class decorator registering a model for the create/update/delete audit
+    receivers in MBP.signals. Saves that only touch `ignore_fields` (derived
+    counters and scores) are skipped.
+
+        @audited
+        class Lead(models.Model): ...
+
+        @audited(ignore_fields=["deals_closed"])
+        class AgentProfile(models.Model): ...
+    """
+    def register(cls):
+        _audited_models[cls] = frozenset(ignore_fields)
+        return cls
+    return register(model) if model is not None else register
+
+
+def get_audited_models():
+    return dict(_audited_models)
+
+
+_request_user = ContextVar("audit_request_user", default=None)
+
+
+@contextmanager
+def audit_user(user):
+    """
+    Attribute every audited save/delete inside the block to `user`, so the
+    request user is known before the (single) save instead of after it.
+    """
+    token = _request_user.set(user)
+    try:
+        yield
+    finally:
+        _request_user.reset(token)
+
+
+def get_audit_user(instance):
+    return getattr(instance, '_request_user', None) or _request_user.get()
+
+
+class AuditLogSink:
+    """
+    Buffers AuditLog rows in memory and writes them with bulk_create from a
+    background thread, either when `batch_size` rows are pending or every
+    `flush_interval` seconds. The request path only enqueues; when
+    `max_pending` rows are already waiting the writer is behind and the
+    entry is written inline instead (counted in `overflowed`), so no row is
+    lost. Rows carry the time they were created, not written.
+    """
+
+    def __init__(self, batch_size=100, flush_interval=2.0, max_pending=10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.overflowed = 0
+
+    def enqueue(self, entry):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            # The writer is behind; pay for this row on the request thread rather than lose it
+            self.overflowed += 1
+            if self.overflowed == 1 or self.overflowed % 1000 == 0:
+                logger.warning("Audit log queue full; %d rows written inline so far", self.overflowed)
+            self._wakeup.set()
+            self._write(entry)
+            return
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        from .models import AuditLog
+
+        with self._flush_lock:
+            while True:
+                batch = self._drain()
+                if not batch:
+                    return
+                try:
+                    with transaction.atomic():
+                        AuditLog.objects.bulk_create(batch, batch_size=self.batch_size)
+                except Exception:
+                    # Retry row by row so one bad row does not lose the whole batch
+                    for entry in batch:
+                        self._write(entry)
+
+    def _write(self, entry):
+        try:
+            with transaction.atomic():
+                entry.save(force_insert=True)
+        except Exception:
+            logger.exception("Failed to write audit log row: %s", entry.details)
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=self.flush_interval * 2)
+        self.flush()
+
+    def _drain(self):
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="audit-log-sink", daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                connection.close()
+
+
+audit_sink = AuditLogSink(
+    batch_size=getattr(settings, "AUDIT_LOG_BATCH_SIZE", 100),
+    flush_interval=getattr(settings, "AUDIT_LOG_FLUSH_INTERVAL", 2.0),
+)
+
+
+def write_audit_entry(entry):
+    """
+    Queue an unsaved AuditLog instance once the current transaction commits
+    (nothing is logged for writes that roll back), or save it inline, as
+    part of that transaction, when AUDIT_LOG_ASYNC is disabled (e.g. in tests).
+    """
+    if getattr(settings, "AUDIT_LOG_ASYNC", True):
+        transaction.on_commit(partial(audit_sink.enqueue, entry))
+    else:
+        entry.save()
+
+
+def write_audit_entries(entries):
+    """
+    write_audit_entry for many rows; the inline path uses one bulk insert.
+    """
+    if getattr(settings, "AUDIT_LOG_ASYNC", True):
+        for entry in entries:
+            transaction.on_commit(partial(audit_sink.enqueue, entry))
+    elif entries:
+        from .models import AuditLog
+
+        AuditLog.objects.bulk_create(entries)
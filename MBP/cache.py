@@ -0,0 +1,68 @@
+import hashlib
+from functools import wraps
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+TAG_VERSION_PREFIX = "resp:tag:"
+
+
+def _tag_versions(tags):
+    keys = [f"{TAG_VERSION_PREFIX}{tag}" for tag in tags]
+    versions = cache.get_many(keys)
+    missing = {key: 1 for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def invalidate_tags(*tags):
+    """
+    Expire every cached response carrying any of `tags` by bumping the tag version.
+    """
+    for tag in tags:
+        key = f"{TAG_VERSION_PREFIX}{tag}"
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 2, timeout=None)
+
+
+def _response_key(request, view_name, tags):
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.lists()))
+    versions = ",".join(str(v) for v in _tag_versions(tags))
+    raw = f"{request.get_host()}|{view_name}|{request.path}|{query}|{versions}"
+    return "resp:" + hashlib.md5(raw.encode()).hexdigest()
+
+
+def cached_response(timeout, tags=()):
+    """
+    Caches the data of successful GET responses of a viewset action. Keys
+    include the path, query parameters and host; entries expire after
+    `timeout` seconds or when one of `tags` is invalidated.
+
+        @action(detail=False, methods=["get"], url_path="top")
+        @cached_response(timeout=300, tags=["agent"])
+        def top_agents(self, request): ...
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method != "GET":
+                return view_method(self, request, *args, **kwargs)
+
+            key = _response_key(request, view_method.__qualname__, tags)
+            data = cache.get(key)
+            if data is not None:
+                response = Response(data, status=status.HTTP_200_OK)
+                response["X-Cache"] = "HIT"
+                return response
+
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                cache.set(key, response.data, timeout)
+                response["X-Cache"] = "MISS"
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+@register()
+def shared_cache_check(app_configs, **kwargs):
+    """
+    The permission matrix version, response cache tags and OTPs live in the
+    default cache; a per-process backend does not reach other workers.
+    """
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    if backend not in PROCESS_LOCAL_CACHES or settings.DEBUG:
+        return []
+    timeout = getattr(settings, "PERMISSION_VERSION_TIMEOUT", 60)
+    return [
+        Warning(
+            f"The default cache ({backend}) is not shared between worker processes.",
+            hint=(
+                f"Permission changes reach other workers only after PERMISSION_VERSION_TIMEOUT "
+                f"({timeout}s) and cached responses are per process. Set CACHE_BACKEND=redis or "
+                f"file when running more than one worker."
+            ),
+            id="MBP.W001",
+        )
+    ]
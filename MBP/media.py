@@ -0,0 +1,224 @@
+"""
+Serving of MEDIA_ROOT files (replaces django.conf.urls.static.static).
+
+Every response carries an ETag (the sha256 for content-addressed blobs,
+see MBP.storage) and Last-Modified, so revalidation is answered with a
+304 from a stat() call. Where a front-end server is configured
+(MEDIA_OFFLOAD = "x-accel-redirect" for nginx, "x-sendfile" for
+Apache/lighttpd) the file itself is handed off and the worker returns
+immediately. Otherwise full files go through FileResponse (sendfile via
+wsgi.file_wrapper) and single `Range: bytes=` requests, e.g. seeking in a
+video, are answered with 206 and read through mmap.
+
+Not everything in MEDIA_ROOT is public. The storage's staging directory
+(blobs/tmp/) and MEDIA_UPLOAD_STAGING_DIR are never served. Files under
+MEDIA_PRIVATE_PREFIXES, and blobs flagged private by MBP.storage, need an
+authenticated request (the API's authentication classes, e.g. a JWT
+Authorization header); anonymous requests get a 404 for them.
+"""
+import io
+import mmap
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from .models import StoredBlob
+from .storage import BLOB_DIR, PRIVATE_PREFIXES, blob_digest
+
+OFFLOAD = getattr(settings, "MEDIA_OFFLOAD", "")
+ACCEL_REDIRECT_PREFIX = getattr(settings, "MEDIA_ACCEL_REDIRECT_PREFIX", "/protected-media/")
+CACHE_MAX_AGE = getattr(settings, "MEDIA_CACHE_MAX_AGE", 3600)
+BLOCK_SIZE = 512 * 1024
+HIDDEN_PREFIXES = (f"{BLOB_DIR}/tmp/",)
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class MappedRange(io.RawIOBase):
+    """
+    Bytes `start`..`end` (inclusive) of a file as a read-only stream over mmap.
+    """
+    def __init__(self, path, start, end):
+        super().__init__()
+        with open(path, "rb") as fh:
+            self._map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(mmap, "MADV_SEQUENTIAL"):
+            self._map.madvise(mmap.MADV_SEQUENTIAL, start - start % mmap.PAGESIZE)
+        self._start = start
+        self._length = end - start + 1
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: self._length}[whence]
+        self._position = max(0, min(self._length, base + offset))
+        return self._position
+
+    def read(self, size=-1):
+        remaining = self._length - self._position
+        size = remaining if size is None or size < 0 else min(size, remaining)
+        begin = self._start + self._position
+        self._position += size
+        return self._map[begin:begin + size]
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self._map.close()
+        super().close()
+
+
+def requested_range(request, size, etag, last_modified):
+    """
+    (start, end) of a single-range request, or None to send the whole file
+    (no Range, several ranges, or a stale If-Range).
+    """
+    match = _RANGE_RE.match(request.META.get("HTTP_RANGE", "").strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    if_range = request.META.get("HTTP_IF_RANGE", "").strip()
+    if if_range and if_range != etag and parse_http_date_safe(if_range) != last_modified:
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        if int(last) == 0 or size == 0:
+            raise RangeNotSatisfiable
+        return max(0, size - int(last)), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable
+    return start, end
+
+
+def is_private(name):
+    if name.startswith(PRIVATE_PREFIXES):
+        return True
+    return bool(blob_digest(name)) and StoredBlob.objects.filter(name=name, private=True).exists()
+
+
+def is_authenticated(request):
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return True
+    api_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        return api_request.user.is_authenticated
+    except APIException:
+        return False
+
+
+def _is_hidden(name, full_path):
+    if name.startswith(HIDDEN_PREFIXES):
+        return True
+    staging_dir = getattr(settings, "MEDIA_UPLOAD_STAGING_DIR", None)
+    if not staging_dir:
+        return False
+    staging_dir = os.path.abspath(staging_dir)
+    return os.path.commonpath([staging_dir, full_path]) == staging_dir
+
+
+def _etag(name, st):
+    digest = blob_digest(name)
+    return f'"{digest}"' if digest else f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+
+@require_safe
+def serve_media(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        st = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError, ValueError):
+        raise Http404("File not found.")
+    if not stat.S_ISREG(st.st_mode):
+        raise Http404("File not found.")
+
+    # The normalized name, so "blobs/./tmp/x" is checked as "blobs/tmp/x"
+    name = os.path.relpath(full_path, os.path.abspath(settings.MEDIA_ROOT)).replace(os.sep, "/")
+    if _is_hidden(name, full_path):
+        raise Http404("File not found.")
+    private = is_private(name)
+    if private and not is_authenticated(request):
+        raise Http404("File not found.")
+
+    size = st.st_size
+    last_modified = int(st.st_mtime)
+    etag = _etag(name, st)
+    content_type, encoding = mimetypes.guess_type(full_path)
+    if encoding:
+        content_type = "application/octet-stream"
+    # Blob names change with their content, so they can be cached for good
+    cache_control = "max-age=31536000, immutable" if blob_digest(name) else f"max-age={CACHE_MAX_AGE}"
+    cache_control = f"{'private' if private else 'public'}, {cache_control}"
+
+    response = HttpResponse(content_type=content_type or "application/octet-stream")
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    response["Cache-Control"] = cache_control
+    response["Accept-Ranges"] = "bytes"
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified, response=response)
+    if conditional is not response:
+        return conditional
+
+    if OFFLOAD == "x-accel-redirect":
+        response["X-Accel-Redirect"] = quote(ACCEL_REDIRECT_PREFIX + name)
+        return response
+    if OFFLOAD == "x-sendfile":
+        response["X-Sendfile"] = full_path
+        return response
+
+    try:
+        byte_range = requested_range(request, size, etag, last_modified)
+    except RangeNotSatisfiable:
+        unsatisfiable = HttpResponse(status=416)
+        unsatisfiable["Content-Range"] = f"bytes */{size}"
+        return unsatisfiable
+
+    if byte_range is None:
+        if request.method == "HEAD":
+            response["Content-Length"] = size
+            return response
+        served = FileResponse(open(full_path, "rb"), content_type=response["Content-Type"])
+    else:
+        start, end = byte_range
+        if request.method == "HEAD":
+            response.status_code = 206
+            response["Content-Length"] = end - start + 1
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+            return response
+        served = FileResponse(MappedRange(full_path, start, end), status=206, content_type=response["Content-Type"])
+        served.block_size = BLOCK_SIZE
+        served["Content-Range"] = f"bytes {start}-{end}/{size}"
+    for header in ("ETag", "Last-Modified", "Cache-Control", "Accept-Ranges"):
+        served[header] = response[header]
+    return served
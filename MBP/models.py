@@ -1,8 +1,11 @@
 from django.db import models
 from django.utils.text import slugify
+from django.utils import timezone
 import uuid
 from django.conf import settings
+from .audit import audited
 
+@audited
 class Role(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=50, unique=True)
@@ -17,6 +20,7 @@ class Role(models.Model):
     def __str__(self):
         return self.name
 
+@audited
 class AppModel(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=100, unique=True)
@@ -34,6 +38,7 @@ class AppModel(models.Model):
     def __str__(self):
         return self.name
 
+@audited
 class PermissionType(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=20)
@@ -48,6 +53,7 @@ class PermissionType(models.Model):
             self.slug = slugify(self.name)
         super().save(*args, **kwargs)
 
+@audited
 class RoleModelPermission(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     slug = models.SlugField(null=True, blank=True)
@@ -97,7 +103,20 @@ class AuditLog(models.Model):
     new_data = models.JSONField(null=True, blank=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(null=True, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)  # event time, set when queued
 
     def __str__(self):
-        return f"{self.timestamp.strftime('%Y-%m-%d %H:%M:%S')} | {self.user} | {self.action} | {self.model_name} ({self.object_id})"
\ No newline at end of file
+        return f"{self.timestamp.strftime('%Y-%m-%d %H:%M:%S')} | {self.user} | {self.action} | {self.model_name} ({self.object_id})"
+
+class StoredBlob(models.Model):
+    """
+    Reference count of one file kept by MBP.storage.ContentAddressedStorage.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    references = models.PositiveIntegerField(default=1)
+    private = models.BooleanField(default=False)   # only saved under MEDIA_PRIVATE_PREFIXES so far
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.references} refs)"
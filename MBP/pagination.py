@@ -0,0 +1,27 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class OrderedCursorPagination(CursorPagination):
+    """
+    Keyset pagination keyed on the viewset queryset's own ordering
+    (e.g. '-listed_on', '-timestamp'), with the primary key appended as a
+    tiebreaker so rows sharing a timestamp keep a stable order.
+
+    Example: /api/properties/?page_size=20&cursor=cD0yMDI1...
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'MAX_PAGE_SIZE', 100)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = tuple(
+            field for field in (queryset.query.order_by or queryset.model._meta.ordering)
+            if isinstance(field, str)
+        )
+        if not ordering:
+            return ('-pk',)
+
+        pk_names = {'pk', queryset.model._meta.pk.name}
+        if not any(field.lstrip('-') in pk_names for field in ordering):
+            ordering += ('-pk',) if ordering[0].startswith('-') else ('pk',)
+        return ordering
@@ -1,17 +1,98 @@
+import threading
+import uuid
+from django.conf import settings
+from django.core.cache import cache
 from rest_framework.permissions import BasePermission
-from .models import RoleModelPermission, AppModel, PermissionType
+from .models import RoleModelPermission
+
+PERMISSION_VERSION_KEY = "mbp:permission_matrix:version"
+# Bounds how long a process can serve a stale matrix when the cache is not
+# shared between processes (locmem), see MBP.checks
+PERMISSION_VERSION_TIMEOUT = getattr(settings, "PERMISSION_VERSION_TIMEOUT", 60)
+
+_matrix_lock = threading.Lock()
+_matrix = {"version": None, "roles": {}, "payloads": {}}
+
+
+def get_permission_version():
+    """
+    Token of the current permission data. It expires after
+    PERMISSION_VERSION_TIMEOUT seconds and is replaced by a fresh one, so
+    every process recompiles its matrix at least that often.
+    """
+    version = cache.get(PERMISSION_VERSION_KEY)
+    if version is None:
+        cache.add(PERMISSION_VERSION_KEY, uuid.uuid4().hex, timeout=PERMISSION_VERSION_TIMEOUT)
+        version = cache.get(PERMISSION_VERSION_KEY)
+    return version
+
+
+def bump_permission_version():
+    """
+    Invalidate the compiled permission matrix immediately in every process
+    sharing the cache backend (file, redis). With a per-process cache
+    (locmem) only this process sees the change right away; the others pick
+    it up when their version token expires.
+    """
+    cache.set(PERMISSION_VERSION_KEY, uuid.uuid4().hex, timeout=PERMISSION_VERSION_TIMEOUT)
+
+
+def _compile_matrix():
+    roles = {}
+    payloads = {}
+    rows = RoleModelPermission.objects.order_by("model__name", "permission_type__code").values_list(
+        "role_id", "model__name", "permission_type__code"
+    )
+    for role_id, model_name, code in rows:
+        roles.setdefault(role_id, set()).add((model_name.lower(), code.lower()))
+        payloads.setdefault(role_id, []).append((model_name, code))
+    return (
+        {role_id: frozenset(perms) for role_id, perms in roles.items()},
+        {role_id: tuple(entries) for role_id, entries in payloads.items()},
+    )
+
+
+def _get_matrix():
+    version = get_permission_version()
+    if _matrix["version"] != version:
+        with _matrix_lock:
+            if _matrix["version"] != version:
+                _matrix["roles"], _matrix["payloads"] = _compile_matrix()
+                _matrix["version"] = version
+    return _matrix
+
+
+def get_role_permissions(role_id):
+    """
+    Returns a frozenset of (model_name_lower, permission_code) for the role.
+    The whole matrix is compiled in one query and reused until the version changes.
+    """
+    return _get_matrix()["roles"].get(role_id, frozenset())
+
+
+def get_role_permission_payload(role_id):
+    """
+    The role's permissions as returned at login, model names and codes as
+    stored: [{"model_name": "Property", "permission": "r"}, ...]. Read from
+    the same compiled matrix as get_role_permissions().
+    """
+    return [
+        {"model_name": model_name, "permission": code}
+        for model_name, code in _get_matrix()["payloads"].get(role_id, ())
+    ]
+
 
 class HasModelPermission(BasePermission):
     def has_permission(self, request, view):
-        
+
         if not request.user or not request.user.is_authenticated:
             return False
-        
+
         if request.user.is_superuser:
             return True
 
-        role = getattr(request.user, 'role', None)
-        if not role:
+        role_id = getattr(request.user, 'role_id', None)
+        if not role_id:
             return False
 
         # Auto infer model_name from view's queryset
@@ -24,13 +105,4 @@ class HasModelPermission(BasePermission):
         if not model_name or not permission_code:
             return False
 
-        try:
-            model_obj = AppModel.objects.get(name__iexact=model_name)
-            perm_type = PermissionType.objects.get(code=permission_code.lower())
-            return RoleModelPermission.objects.filter(
-                role=role,
-                model=model_obj,
-                permission_type=perm_type
-            ).exists()
-        except (AppModel.DoesNotExist, PermissionType.DoesNotExist):
-            return False
+        return (model_name.lower(), permission_code.lower()) in get_role_permissions(role_id)
@@ -1,18 +1,22 @@
+from django.apps import apps
+from django.db import transaction
 from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from .models import AuditLog
+from django.conf import settings
+from .models import Role, AppModel, PermissionType, RoleModelPermission
 from .utils import log_audit_from_user
-from .utils import serialize_instance
+from .utils import serialize_instance, diff_snapshots
+from .audit import get_audited_models, get_audit_user
+from .permissions import bump_permission_version
+from .storage import content_addressed_fields
 
 
-@receiver(post_save)
-def log_create_or_update(sender, instance, created, **kwargs):
-    if sender == AuditLog:
+def log_create_or_update(sender, instance, created, update_fields=None, **kwargs):
+    user = get_audit_user(instance)
+    if not user:
         return
 
-    user = getattr(instance, '_request_user', None)
-    if not user:
-        print("No _request_user found. Skipping.")
+    if update_fields and frozenset(update_fields) <= _audited_models[sender]:
         return
 
     model_name = sender.__name__
@@ -30,6 +34,8 @@ def log_create_or_update(sender, instance, created, **kwargs):
             new_data=new_data
         )
     else:
+        if getattr(settings, "AUDIT_LOG_DIFF_ONLY", True) and old_data is not None:
+            old_data, new_data = diff_snapshots(old_data, new_data)
         log_audit_from_user(
             user=user,
             action='update',
@@ -41,12 +47,8 @@ def log_create_or_update(sender, instance, created, **kwargs):
         )
 
 
-@receiver(post_delete)
 def log_deletion(sender, instance, **kwargs):
-    if sender == AuditLog:
-        return
-
-    user = getattr(instance, '_request_user', None)
+    user = get_audit_user(instance)
     if not user:
         return
 
@@ -62,3 +64,56 @@ def log_deletion(sender, instance, **kwargs):
         details=f"Signal: Deleted {model_name}: {instance}",
         old_data=old_data
     )
+
+
+# Audit receivers are only connected for models registered with @audited,
+# so unrelated saves (sessions, token blacklist, ...) never reach them.
+_audited_models = get_audited_models()
+for _model in _audited_models:
+    post_save.connect(log_create_or_update, sender=_model, dispatch_uid=f"audit-save-{_model._meta.label}")
+    post_delete.connect(log_deletion, sender=_model, dispatch_uid=f"audit-delete-{_model._meta.label}")
+
+
+def remember_replaced_files(sender, instance, **kwargs):
+    if instance._state.adding or instance.pk is None:
+        return
+    replaced = [field for field in _blob_fields[sender] if not getattr(instance, field.name)._committed]
+    if not replaced:
+        return
+    old = sender._base_manager.filter(pk=instance.pk).values(*(field.attname for field in replaced)).first() or {}
+    instance._replaced_files = [(field.storage, old[field.attname]) for field in replaced if old.get(field.attname)]
+
+
+def release_replaced_files(sender, instance, **kwargs):
+    for storage, name in instance.__dict__.pop('_replaced_files', ()):
+        transaction.on_commit(lambda storage=storage, name=name: storage.delete(name))
+
+
+def release_deleted_files(sender, instance, **kwargs):
+    for field in _blob_fields[sender]:
+        name = getattr(instance, field.attname)
+        if name:
+            transaction.on_commit(lambda storage=field.storage, name=str(name): storage.delete(name))
+
+
+# Content-addressed files are reference counted (MBP.storage): a row that is
+# deleted, or whose file is replaced, gives up its reference once committed.
+_blob_fields = {model: content_addressed_fields(model) for model in apps.get_models()}
+_blob_fields = {model: fields for model, fields in _blob_fields.items() if fields}
+for _model in _blob_fields:
+    pre_save.connect(remember_replaced_files, sender=_model, dispatch_uid=f"blob-replace-{_model._meta.label}")
+    post_save.connect(release_replaced_files, sender=_model, dispatch_uid=f"blob-release-{_model._meta.label}")
+    post_delete.connect(release_deleted_files, sender=_model, dispatch_uid=f"blob-delete-{_model._meta.label}")
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+@receiver(post_save, sender=AppModel)
+@receiver(post_delete, sender=AppModel)
+@receiver(post_save, sender=PermissionType)
+@receiver(post_delete, sender=PermissionType)
+@receiver(post_save, sender=RoleModelPermission)
+@receiver(post_delete, sender=RoleModelPermission)
+def invalidate_permission_matrix(sender, **kwargs):
+    # After commit, so no request can compile the matrix from pre-commit rows under the new version
+    transaction.on_commit(bump_permission_version)
@@ -0,0 +1,145 @@
+"""
+Content-addressed storage for user uploads.
+
+Files are hashed (sha256) while they are streamed to disk and stored once
+per distinct content as `blobs/<aa>/<bb>/<sha256><ext>`; saving content
+that is already stored skips the write and returns the existing name. A
+StoredBlob row counts the references to each file: every save adds one,
+every delete() drops one, and the file goes away with the last reference.
+MBP.signals releases the references of deleted rows and replaced files.
+
+Because equal content always gets the same name, anything keyed on the
+file name (image derivatives, OCR jobs) is keyed on the content. For the
+same reason a blob name does not tell which field it belongs to: a blob
+saved only under MEDIA_PRIVATE_PREFIXES (rent agreements, property
+documents, ...) is flagged `private`, and MBP.media serves it to
+authenticated requests only. Saving the same content under a public
+prefix clears the flag.
+"""
+import hashlib
+import os
+import re
+import tempfile
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.fields.files import FileField
+
+BLOB_DIR = "blobs"
+READ_SIZE = 1024 * 1024
+PRIVATE_PREFIXES = tuple(getattr(settings, "MEDIA_PRIVATE_PREFIXES", (
+    "rent_agreements/", "property_documents/", "problem_reports/", "grievance_evidence/", "notice_responses/",
+)))
+
+_BLOB_NAME_RE = re.compile(rf"^{BLOB_DIR}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/([0-9a-f]{{64}})(\.[^/]*)?$")
+
+
+def blob_name(digest, extension=""):
+    return f"{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+
+def blob_digest(name):
+    """
+    The sha256 a content-addressed file name was derived from, or None.
+    """
+    match = _BLOB_NAME_RE.match(name or "")
+    return match.group(1) if match else None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def get_available_name(self, name, max_length=None):
+        # _save() picks the name from the content; the requested one only supplies the extension
+        return name
+
+    def _stage(self, content):
+        """
+        (path, sha256, size, owned) of the content on local disk. Uploads
+        Django already spooled to a temp file are hashed in place; anything
+        else is hashed while it is written to a temp file next to the blobs.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        if hasattr(content, "temporary_file_path"):
+            path = content.temporary_file_path()
+            with open(path, "rb") as fh:
+                for chunk in iter(lambda: fh.read(READ_SIZE), b""):
+                    digest.update(chunk)
+                    size += len(chunk)
+            return path, digest.hexdigest(), size, False
+
+        staging_dir = self.path(os.path.join(BLOB_DIR, "tmp"))
+        os.makedirs(staging_dir, exist_ok=True)
+        if hasattr(content, "seek"):
+            content.seek(0)
+        with tempfile.NamedTemporaryFile(dir=staging_dir, delete=False) as fh:
+            for chunk in content.chunks():
+                digest.update(chunk)
+                size += len(chunk)
+                fh.write(chunk)
+        return fh.name, digest.hexdigest(), size, True
+
+    def _save(self, name, content):
+        from .models import StoredBlob
+
+        extension = os.path.splitext(name)[1].lower()
+        private = name.startswith(PRIVATE_PREFIXES)
+        staged, digest, size, owned = self._stage(content)
+        name = blob_name(digest, extension)
+        reference = {"references": F("references") + 1}
+        if not private:
+            reference["private"] = False
+        try:
+            # A duplicate costs one UPDATE; a blob being deleted concurrently
+            # is either still counted here or already gone from disk below
+            if not StoredBlob.objects.filter(name=name).update(**reference):
+                try:
+                    with transaction.atomic():
+                        StoredBlob.objects.create(name=name, size=size, private=private)
+                except IntegrityError:
+                    StoredBlob.objects.filter(name=name).update(**reference)
+            full_path = self.path(name)
+            if not os.path.exists(full_path):
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                file_move_safe(staged, full_path, allow_overwrite=True)
+                owned = False
+                if self.file_permissions_mode is not None:
+                    os.chmod(full_path, self.file_permissions_mode)
+        finally:
+            if owned and os.path.exists(staged):
+                os.remove(staged)
+        return name
+
+    def delete(self, name):
+        from .models import StoredBlob
+
+        with transaction.atomic():
+            blob = StoredBlob.objects.select_for_update().filter(name=name).first()
+            if blob is not None and blob.references > 1:
+                StoredBlob.objects.filter(pk=blob.pk).update(references=F("references") - 1)
+                return
+            if blob is not None:
+                blob.delete()
+            super().delete(name)
+
+
+content_addressed_storage = ContentAddressedStorage()
+
+
+def media_storage():
+    """
+    Storage of the upload fields (`FileField(storage=media_storage)`);
+    CONTENT_ADDRESSED_MEDIA = False stores them by name in default_storage.
+    """
+    if getattr(settings, "CONTENT_ADDRESSED_MEDIA", True):
+        return content_addressed_storage
+    return default_storage
+
+
+def content_addressed_fields(model):
+    return [
+        field for field in model._meta.concrete_fields
+        if isinstance(field, FileField) and isinstance(field.storage, ContentAddressedStorage)
+    ]
@@ -1,3 +1,267 @@
-from django.test import TestCase
+import os
+import tempfile
+from unittest import mock
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.http import Http404
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from accounts.models import User
+from .audit import AuditLogSink, audit_sink, audit_user
+from .checks import shared_cache_check
+from .media import serve_media
+from .models import AuditLog, AppModel, PermissionType, Role, RoleModelPermission, StoredBlob
+from .permissions import PERMISSION_VERSION_KEY, get_role_permission_payload, get_role_permissions
+from .storage import content_addressed_storage
+from .utils import aggregate_buckets, reconstruct_snapshot, serialize_instance
 
-# Create your tests here.
+
+def write_statements(queries, table):
+    return [
+        query["sql"] for query in queries
+        if query["sql"].startswith(("INSERT", "UPDATE", "DELETE")) and f'"{table}"' in query["sql"]
+    ]
+
+
+@override_settings(AUDIT_LOG_ASYNC=True)
+class WritePipelineQueryTests(TestCase):
+    """
+    Each API write is one statement on the model's table; the audit row is
+    only queued (the sink's enqueue is stubbed so no background thread runs).
+    """
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email="admin@example.com", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.role = Role.objects.create(name="viewer")
+        patcher = mock.patch.object(audit_sink, "enqueue")
+        self.enqueue = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_create(self):
+        # unique checks on name and slug, then the INSERT
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as ctx:
+            response = self.client.post("/api/roles/", {"name": "agent", "description": "Agents"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(write_statements(ctx.captured_queries, "MBP_role")), 1)
+        self.assertEqual(len(ctx.captured_queries), 3)
+        self.assertEqual(self.enqueue.call_count, 1)
+
+    def test_update(self):
+        # object lookup, then the UPDATE
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as ctx:
+            response = self.client.patch(f"/api/roles/{self.role.slug}/", {"description": "Read only"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(write_statements(ctx.captured_queries, "MBP_role")), 1)
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertEqual(self.enqueue.call_count, 1)
+
+    def test_destroy(self):
+        # object lookup, cascade collection (users, role permissions), then the DELETE
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as ctx:
+            response = self.client.delete(f"/api/roles/{self.role.slug}/")
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(len(write_statements(ctx.captured_queries, "MBP_role")), 1)
+        self.assertEqual(len(ctx.captured_queries), 4)
+        self.assertEqual(self.enqueue.call_count, 1)
+
+    def test_rolled_back_write_is_not_logged(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                Role.objects.create(name="temporary")
+                raise RuntimeError
+        self.assertEqual(self.enqueue.call_count, 0)
+
+
+class AggregateBucketsTests(TestCase):
+    def test_all_buckets_in_one_query(self):
+        for name in ("agent", "agent-lead", "viewer", "admin"):
+            Role.objects.create(name=name, description="staff" if name.startswith("agent") else "")
+        with self.assertNumQueries(1):
+            counts = aggregate_buckets(
+                Role.objects.all(),
+                total=Q(),
+                agents=Q(name__startswith="agent"),
+                staff=Q(description="staff"),
+                described=Count("pk", filter=~Q(description="")),
+            )
+        self.assertEqual(counts, {"total": 4, "agents": 2, "staff": 2, "described": 2})
+
+
+class AuditLogSinkTests(TestCase):
+    def make_sink(self, **options):
+        sink = AuditLogSink(**options)
+        # Flushed by hand below instead of from the writer thread
+        patcher = mock.patch.object(sink, "_ensure_started")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return sink
+
+    def test_full_queue_writes_inline(self):
+        sink = self.make_sink(max_pending=2)
+        with self.assertNumQueries(0):
+            for index in range(2):
+                sink.enqueue(AuditLog(action="other", details=f"row {index}"))
+        sink.enqueue(AuditLog(action="other", details="row 2"))
+        self.assertEqual(sink.overflowed, 1)
+        self.assertEqual(list(AuditLog.objects.values_list("details", flat=True)), ["row 2"])
+        sink.flush()
+        self.assertEqual(AuditLog.objects.count(), 3)
+
+    def test_failed_batch_is_retried_row_by_row(self):
+        sink = self.make_sink()
+        sink.enqueue(AuditLog(action="other", details="good"))
+        sink.enqueue(AuditLog(action=None, details="bad"))
+        sink.enqueue(AuditLog(action="other", details="also good"))
+        sink.flush()
+        self.assertEqual(set(AuditLog.objects.values_list("details", flat=True)), {"good", "also good"})
+
+    def test_rows_keep_their_creation_time(self):
+        sink = self.make_sink()
+        first, second = AuditLog(action="other", details="first"), AuditLog(action="other", details="second")
+        sink.enqueue(first)
+        sink.enqueue(second)
+        created_at = first.timestamp
+        sink.flush()
+        self.assertEqual(AuditLog.objects.get(details="first").timestamp, created_at)
+        self.assertEqual(
+            list(AuditLog.objects.order_by("timestamp").values_list("details", flat=True)), ["first", "second"]
+        )
+
+
+class PermissionMatrixTests(TestCase):
+    def setUp(self):
+        # Writes inside the test transaction never commit, so start from a fresh version
+        cache.clear()
+        self.role = Role.objects.create(name="agent")
+        self.model = AppModel.objects.create(name="PropertyImage", verbose_name="Property image", app_label="property")
+        self.read = PermissionType.objects.create(name="Read", code="r")
+        RoleModelPermission.objects.create(role=self.role, model=self.model, permission_type=self.read)
+
+    def test_checks_and_login_payload_share_one_compiled_matrix(self):
+        self.assertIn(("propertyimage", "r"), get_role_permissions(self.role.id))
+        with self.assertNumQueries(0):
+            get_role_permissions(self.role.id)
+            payload = get_role_permission_payload(self.role.id)
+        self.assertEqual(payload, [{"model_name": "PropertyImage", "permission": "r"}])
+
+    def test_revocation_and_expired_version_recompile(self):
+        self.assertTrue(get_role_permissions(self.role.id))
+        with self.captureOnCommitCallbacks(execute=True):
+            RoleModelPermission.objects.filter(role=self.role).delete()
+            # The version only moves once the revocation is committed
+            self.assertTrue(get_role_permissions(self.role.id))
+        self.assertEqual(get_role_permissions(self.role.id), frozenset())
+        # A process that missed the bump (per-process cache) recompiles once its token expires
+        RoleModelPermission.objects.create(role=self.role, model=self.model, permission_type=self.read)
+        cache.set(PERMISSION_VERSION_KEY, "stale")
+        get_role_permissions(self.role.id)
+        RoleModelPermission.objects.filter(role=self.role).delete()
+        cache.set(PERMISSION_VERSION_KEY, "stale")
+        self.assertTrue(get_role_permissions(self.role.id))
+        cache.delete(PERMISSION_VERSION_KEY)
+        self.assertEqual(get_role_permissions(self.role.id), frozenset())
+
+    @override_settings(DEBUG=False, CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+    def test_process_local_cache_warning(self):
+        self.assertEqual([message.id for message in shared_cache_check(None)], ["MBP.W001"])
+
+
+class MediaAccessTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.media_root = media_root.name
+        self.user = User.objects.create_user(email="tenant@example.com", password="pw")
+
+    def get(self, path, user=None):
+        request = RequestFactory().get(f"/media/{path}")
+        request.user = user or AnonymousUser()
+        try:
+            return serve_media(request, path).status_code
+        except Http404:
+            return 404
+
+    def write(self, name, data=b"data"):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as fh:
+            fh.write(data)
+
+    def test_staging_files_are_never_served(self):
+        self.write("blobs/tmp/tmpabc123")
+        for path in ("blobs/tmp/tmpabc123", "blobs/./tmp/tmpabc123", "blobs//tmp/tmpabc123"):
+            self.assertEqual(self.get(path, self.user), 404, path)
+
+    def test_private_blob_needs_authentication(self):
+        name = content_addressed_storage.save("rent_agreements/lease.pdf", ContentFile(b"lease"))
+        self.assertTrue(StoredBlob.objects.get(name=name).private)
+        self.assertEqual(self.get(name), 404)
+        self.assertEqual(self.get(name, self.user), 200)
+
+        # The same content uploaded as a listing image is public
+        self.assertEqual(content_addressed_storage.save("property_images/lease.pdf", ContentFile(b"lease")), name)
+        self.assertEqual(self.get(name), 200)
+
+    def test_private_prefix_needs_authentication(self):
+        self.write("property_documents/deed.pdf")
+        self.write("property_images/front.jpg")
+        self.assertEqual(self.get("property_documents/deed.pdf"), 404)
+        self.assertEqual(self.get("property_documents/deed.pdf", self.user), 200)
+        self.assertEqual(self.get("property_images/front.jpg"), 200)
+
+
+@override_settings(AUDIT_LOG_ASYNC=False, AUDIT_LOG_DIFF_ONLY=True)
+class AuditSnapshotTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email="admin@example.com", password="pw")
+        # Created without an audit user, so there is no create entry to replay from
+        self.role = Role.objects.create(name="agent", description="initial")
+
+    def update(self, **fields):
+        self.role._old_data = serialize_instance(self.role)
+        for name, value in fields.items():
+            setattr(self.role, name, value)
+        with audit_user(self.admin):
+            self.role.save()
+        return AuditLog.objects.filter(action="update").latest("timestamp", "id")
+
+    def test_rebuilds_full_state_without_a_create_entry(self):
+        first = self.update(description="one")
+        second = self.update(description="two", name="senior agent")
+        self.assertEqual(first.new_data, {"description": "one"})
+        snapshot = reconstruct_snapshot(first)
+        self.assertEqual((snapshot["name"], snapshot["description"]), ("agent", "one"))
+        self.assertEqual(snapshot["id"], str(self.role.pk))
+        self.assertEqual(reconstruct_snapshot(second)["name"], "senior agent")
+
+    def test_rebuilds_from_the_delete_entry(self):
+        first = self.update(description="one")
+        self.update(description="two")
+        with audit_user(self.admin):
+            self.role.delete()
+        self.assertEqual(reconstruct_snapshot(first)["description"], "one")
+
+    def test_missing_baseline_raises(self):
+        first = self.update(description="one")
+        Role.objects.filter(pk=self.role.pk).delete()
+        with self.assertRaises(LookupError):
+            reconstruct_snapshot(first)
+
+    def test_foreign_keys_are_logged_as_raw_keys(self):
+        model = AppModel.objects.create(name="Lead", verbose_name="Lead", app_label="crm_engagement")
+        read = PermissionType.objects.create(name="Read", code="r")
+        permission = RoleModelPermission.objects.create(role=self.role, model=model, permission_type=read)
+        permission = RoleModelPermission.objects.get(pk=permission.pk)
+        with self.assertNumQueries(0):
+            data = serialize_instance(permission)
+        self.assertEqual(data["role"], str(self.role.pk))
+        self.assertEqual(data["model"], str(model.pk))
@@ -1,42 +1,147 @@
 from .models import AuditLog
-from django.core.serializers.json import DjangoJSONEncoder
-from django.db.models.fields.files import FileField, ImageField
-from django.db.models import Model
-from decimal import Decimal
-import json
-import uuid
-import datetime
+from .audit import write_audit_entry, write_audit_entries, get_audit_user, get_audited_models
+from django.db.models import Count, Q
+from django.db.models.fields.files import FileField
+from functools import lru_cache
+import logging
+
+logger = logging.getLogger(__name__)
+
+_JSON_NATIVE_TYPES = {
+    "AutoField", "BigAutoField", "SmallAutoField", "IntegerField", "BigIntegerField",
+    "SmallIntegerField", "PositiveIntegerField", "PositiveBigIntegerField",
+    "PositiveSmallIntegerField", "FloatField", "BooleanField", "NullBooleanField",
+    "CharField", "TextField", "SlugField", "EmailField", "URLField", "JSONField",
+}
+
+
+def _file_url(value):
+    return value.url if value else None
+
+
+def _field_converter(field):
+    if isinstance(field, FileField):
+        return field.name, _file_url
+    if field.is_relation:
+        # Store the raw key; str(related_obj) would cost a query per FK.
+        return field.attname, str
+    internal_type = field.get_internal_type()
+    if internal_type in _JSON_NATIVE_TYPES:
+        return field.name, None
+    if internal_type == "DecimalField":
+        return field.name, float
+    # UUIDs, dates, times, durations, IPs, ...
+    return field.name, str
+
+
+@lru_cache(maxsize=None)
+def get_field_serializers(model):
+    """
+    Per-model table of (field_name, attribute, converter) built once per process.
+    """
+    table = []
+    for field in model._meta.concrete_fields:
+        attribute, converter = _field_converter(field)
+        table.append((field.name, attribute, converter))
+    return tuple(table)
 
 
 def serialize_instance(instance):
+    """
+    JSON-ready {field_name: value} of the concrete fields of `instance`.
+    Foreign keys are logged as the raw key under the field name, e.g.
+    {"role": "3f0c..."}: audit rows written before field-level diffs
+    hold str(related_object) there instead.
+    """
     data = {}
-    for field in instance._meta.fields:
-        field_name = field.name
-        value = getattr(instance, field_name, None)
+    for field_name, attribute, converter in get_field_serializers(type(instance)):
+        value = getattr(instance, attribute, None)
+        if value is None or converter is None:
+            data[field_name] = value
+        else:
+            data[field_name] = converter(value)
+    return data
 
-        if isinstance(field, (FileField, ImageField)):
-            data[field_name] = value.url if value else None
 
-        elif isinstance(value, (uuid.UUID, datetime.datetime, datetime.date)):
-            data[field_name] = str(value)
+def diff_snapshots(old_data, new_data):
+    """
+    Returns (old, new) dicts restricted to the fields whose value changed.
+    """
+    old_data = old_data or {}
+    new_data = new_data or {}
+    old_changes, new_changes = {}, {}
+    for field_name, new_value in new_data.items():
+        old_value = old_data.get(field_name)
+        if old_value != new_value:
+            old_changes[field_name] = old_value
+            new_changes[field_name] = new_value
+    return old_changes, new_changes
 
-        elif isinstance(value, Decimal):
-            # Convert Decimal to float for JSON serialization
-            data[field_name] = float(value)
 
-        elif isinstance(value, Model):
-            data[field_name] = str(value)
+def _audited_model(model_name):
+    for model in get_audited_models():
+        if model.__name__ == model_name:
+            return model
+    return None
 
-        else:
-            try:
-                json.dumps(value, cls=DjangoJSONEncoder)
-                data[field_name] = value
-            except (TypeError, ValueError):
-                data[field_name] = str(value)
 
-    return data
+def reconstruct_snapshot(log):
+    """
+    Rebuilds the full state of the audited object as of `log`. Starts from
+    the current row (or the full snapshot logged when it was deleted) and
+    undoes every later change, newest first, so objects whose create entry
+    is missing or predates diff logging are rebuilt in full too. Columns
+    written without an audit entry (e.g. QuerySet.update) show their current
+    value. Raises LookupError when the row is gone and no delete was logged.
+    """
+    if log.action == "delete":
+        return dict(log.old_data or {})
+
+    later = AuditLog.objects.filter(
+        Q(timestamp__gt=log.timestamp) | Q(timestamp=log.timestamp, id__gt=log.id),
+        model_name=log.model_name,
+        object_id=log.object_id,
+        action__in=["update", "delete"],
+    ).order_by("-timestamp", "-id")
+
+    snapshot = None
+    for entry in later.iterator():
+        if entry.action == "delete":
+            # The full state just before the delete
+            snapshot = dict(entry.old_data or {})
+            continue
+        if snapshot is None:
+            snapshot = _current_snapshot(log)
+        snapshot.update(entry.old_data or {})
+    if snapshot is None:
+        snapshot = _current_snapshot(log)
+    return snapshot
 
 
+def _current_snapshot(log):
+    model = _audited_model(log.model_name)
+    instance = model._default_manager.filter(pk=log.object_id).first() if model else None
+    if instance is None:
+        raise LookupError(f"No stored state of {log.model_name} {log.object_id} to rebuild the snapshot from.")
+    return serialize_instance(instance)
+
+
+def aggregate_buckets(queryset, **buckets):
+    """
+    Computes every bucket of an endpoint in a single aggregate() query.
+    A bucket is either a Q, counting the matching rows (Q() counts all rows),
+    or an aggregate expression such as Sum('amount', filter=Q(...)).
+
+        aggregate_buckets(qs, total=Q(), verified=Q(verified=True))
+    """
+    expressions = {}
+    for name, bucket in buckets.items():
+        if isinstance(bucket, Q):
+            expressions[name] = Count('pk', filter=bucket or None)
+        else:
+            expressions[name] = bucket
+    return queryset.aggregate(**expressions)
+
 
 def get_client_ip(request):
     x_forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -46,9 +151,8 @@ def get_user_agent(request):
     return request.META.get('HTTP_USER_AGENT', '')
 
 def log_audit(request, action, model_name=None, object_id=None, details=None, old_data=None, new_data=None):
-    print(f"3.1 Calling log_audit_from_user for {model_name}, action: {action}")
     try:
-        AuditLog.objects.create(
+        write_audit_entry(AuditLog(
             user=request.user if request and request.user.is_authenticated else None,
             action=action,
             model_name=model_name,
@@ -58,14 +162,13 @@ def log_audit(request, action, model_name=None, object_id=None, details=None, ol
             new_data=new_data,
             ip_address=get_client_ip(request) if request else None,
             user_agent=get_user_agent(request) if request else None
-        )
-    except Exception as e:
-        print("Failed to create audit log:", e)
+        ))
+    except Exception:
+        logger.exception("Failed to queue audit log")
 
 def log_audit_from_user(user, action, model_name=None, object_id=None, details=None, old_data=None, new_data=None):
-    print(f"3.2 Calling log_audit_from_user for {model_name}, action: {action}")
     try:
-        AuditLog.objects.create(
+        write_audit_entry(AuditLog(
             user=user,
             action=action,
             model_name=model_name,
@@ -73,6 +176,31 @@ def log_audit_from_user(user, action, model_name=None, object_id=None, details=N
             details=details,
             old_data=old_data,
             new_data=new_data
-        )
-    except Exception as e:
-        print(" Failed to create audit log:", e)
+        ))
+    except Exception:
+        logger.exception("Failed to queue audit log")
+
+def log_bulk_create(instances):
+    """
+    'create' audit entries for rows inserted with bulk_create, which sends no
+    post_save signals; attributed like the receivers in MBP.signals.
+    """
+    audited_models = get_audited_models()
+    entries = []
+    for instance in instances:
+        model = type(instance)
+        user = get_audit_user(instance)
+        if model not in audited_models or not user:
+            continue
+        entries.append(AuditLog(
+            user=user,
+            action='create',
+            model_name=model.__name__,
+            object_id=str(instance.pk),
+            details=f"Created {model.__name__}",
+            new_data=serialize_instance(instance),
+        ))
+    try:
+        write_audit_entries(entries)
+    except Exception:
+        logger.exception("Failed to queue audit logs")
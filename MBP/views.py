@@ -1,4 +1,11 @@
-from rest_framework import viewsets
+import hashlib
+from django.db.models import Count, Max
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import BasePermission
+from rest_framework.response import Response
 from .permissions import HasModelPermission
 from .models import Role, AppModel, PermissionType, RoleModelPermission, AuditLog
 from .serializers import (
@@ -8,8 +15,8 @@ from .serializers import (
     RoleModelPermissionSerializer,
     AuditLogSerializer
 )
-from .utils import serialize_instance
-from django.db.models.signals import post_save
+from .utils import serialize_instance, reconstruct_snapshot
+from .audit import audit_user
 
 
 class ProtectedModelViewSet(viewsets.ModelViewSet):
@@ -28,21 +35,108 @@ class ProtectedModelViewSet(viewsets.ModelViewSet):
             self.permission_code = 'r'
         return [permission() for permission in self.permission_classes]
 
+    def get_version_field(self):
+        """
+        The auto_now column probed for conditional GETs (e.g. Property.last_updated),
+        or None when the model has no such column.
+        """
+        model = self.get_queryset().model
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False):
+                return field.name
+        return None
+
+    def conditional_response(self, request, last_modified, count, render, use_last_modified=True):
+        """
+        Answers If-None-Match / If-Modified-Since with a 304 when the probed
+        version (newest timestamp and row count) is unchanged; otherwise calls
+        `render()` and stamps ETag / Last-Modified on its response. Lists pass
+        use_last_modified=False: deleting a row leaves their newest timestamp
+        unchanged, so only the ETag (which includes the count) is reliable.
+        """
+        user = request.user.pk if request.user.is_authenticated else ''
+        renderer = getattr(request, 'accepted_renderer', None)
+        raw = f"{request.get_full_path()}|{user}|{getattr(renderer, 'format', '')}|{last_modified}|{count}"
+        etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+        last_modified_ts = int(last_modified.timestamp()) if last_modified and use_last_modified else None
+
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        if if_none_match:
+            not_modified = etag in parse_etags(if_none_match) or if_none_match.strip() == '*'
+        else:
+            not_modified = bool(last_modified_ts and if_modified_since and last_modified_ts <= if_modified_since)
+
+        response = Response(status=status.HTTP_304_NOT_MODIFIED) if not_modified else render()
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            if last_modified_ts:
+                response['Last-Modified'] = http_date(last_modified_ts)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        version_field = self.get_version_field()
+        if version_field is None:
+            return super().list(request, *args, **kwargs)
+        probe = self.filter_queryset(self.get_queryset()).order_by().aggregate(
+            last_modified=Max(version_field), count=Count('pk')
+        )
+        return self.conditional_response(
+            request, probe['last_modified'], probe['count'],
+            lambda: super(ProtectedModelViewSet, self).list(request, *args, **kwargs),
+            use_last_modified=False,
+        )
+
+    def get_object_version(self):
+        """
+        The version column of the object addressed by the URL, read without
+        loading the row or its relations; None if unknown or not found.
+        """
+        version_field = self.get_version_field()
+        if version_field is None:
+            return None
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return (
+            self.filter_queryset(self.get_queryset())
+            .filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+            .values_list(version_field, flat=True)
+            .first()
+        )
+
+    def has_object_permissions(self):
+        return any(
+            type(permission).has_object_permission is not BasePermission.has_object_permission
+            for permission in self.get_permissions()
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        version_field = self.get_version_field()
+        if version_field is not None and self.has_object_permissions():
+            # Object permissions need the row itself; a 304 still skips serializing it
+            instance = self.get_object()
+            return self.conditional_response(
+                request, getattr(instance, version_field), 1,
+                lambda: Response(self.get_serializer(instance).data),
+            )
+        last_modified = self.get_object_version()
+        if last_modified is None:
+            # No version column, or a missing row that get_object() turns into a 404.
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional_response(
+            request, last_modified, 1,
+            lambda: super(ProtectedModelViewSet, self).retrieve(request, *args, **kwargs),
+        )
+
     def perform_create(self, serializer):
         serializer.context['request'] = self.request
-        instance = serializer.save()
-        instance._request_user = self.request.user
-        post_save.send(sender=instance.__class__, instance=instance, created=True)
-        # instance.save()
+        with audit_user(self.request.user):
+            serializer.save()
 
     def perform_update(self, serializer):
-        instance = self.get_object()
-        instance._old_data = serialize_instance(instance)
-        instance._request_user = self.request.user
-        updated_instance = serializer.save()
-        updated_instance._request_user = self.request.user
-        updated_instance._old_data = instance._old_data
-        updated_instance.save()
+        # serializer.instance was already fetched by update(); snapshot it before the single save
+        serializer.instance._old_data = serialize_instance(serializer.instance)
+        with audit_user(self.request.user):
+            serializer.save()
 
     def perform_destroy(self, instance):
         instance._request_user = self.request.user
@@ -94,3 +188,20 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
         if action:
             queryset = queryset.filter(action=action)
         return queryset
+
+    @action(detail=True, methods=['get'], url_path='snapshot')
+    def snapshot(self, request, pk=None):
+        """
+        Full object state as of this log entry, rebuilt from the stored diffs.
+        """
+        log = self.get_object()
+        try:
+            data = reconstruct_snapshot(log)
+        except LookupError as exc:
+            raise NotFound(str(exc))
+        return Response({
+            "model_name": log.model_name,
+            "object_id": log.object_id,
+            "timestamp": log.timestamp,
+            "data": data,
+        })
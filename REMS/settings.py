@@ -244,8 +244,13 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'MBP.pagination.OrderedCursorPagination',
+    'PAGE_SIZE': int(os.getenv('PAGE_SIZE', 20)),
 }
 
+# Upper bound for ?page_size= on paginated list endpoints
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 100))
+
 from datetime import timedelta
 
 SIMPLE_JWT = {
@@ -271,6 +276,61 @@ EMAIL_HOST_USER = env("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = env("EMAIL_HOST_PASSWORD")
 DEFAULT_FROM_EMAIL = env("DEFAULT_FROM_EMAIL", default="Real Estate <noreply@realestate.com>")
 
+# Cache backend (response cache, permission matrix version, OTPs):
+# CACHE_BACKEND=locmem (per process), file (shared on one host) or redis (shared).
+# With locmem and several workers, permission changes reach the other workers
+# only after PERMISSION_VERSION_TIMEOUT seconds (check MBP.W001 warns about it)
+CACHE_BACKEND = env("CACHE_BACKEND", default="locmem")
+CACHE_BACKENDS = {
+    "locmem": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "rems",
+    },
+    "file": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": env("CACHE_LOCATION", default=str(BASE_DIR / "cache")),
+    },
+    "redis": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": env("REDIS_URL", default="redis://127.0.0.1:6379/1"),
+    },
+}
+CACHES = {"default": CACHE_BACKENDS[CACHE_BACKEND]}
+PERMISSION_VERSION_TIMEOUT = env.int("PERMISSION_VERSION_TIMEOUT", default=60)
+
+# Audit log writer (MBP.audit): rows are buffered and bulk inserted off the request path
+AUDIT_LOG_ASYNC = env.bool("AUDIT_LOG_ASYNC", default=True)
+AUDIT_LOG_BATCH_SIZE = env.int("AUDIT_LOG_BATCH_SIZE", default=100)
+AUDIT_LOG_FLUSH_INTERVAL = env.float("AUDIT_LOG_FLUSH_INTERVAL", default=2.0)
+# Store only changed fields on updates; full snapshots via /api/logs/{id}/snapshot/.
+# Audit data logs foreign keys as raw keys (older rows hold str(related_object))
+AUDIT_LOG_DIFF_ONLY = env.bool("AUDIT_LOG_DIFF_ONLY", default=True)
+
+# Trained price estimator artifact (python manage.py train_price_model)
+PRICE_MODEL_DIR = env("PRICE_MODEL_DIR", default=str(BASE_DIR / "ml_models" / "price"))
+
+# Property images/videos/documents, rent agreements and problem report attachments
+# are stored once per distinct content (MBP.storage); False stores them by name
+CONTENT_ADDRESSED_MEDIA = env.bool("CONTENT_ADDRESSED_MEDIA", default=True)
+
+# Media serving (MBP.media): "x-accel-redirect" hands files to nginx through an
+# internal location MEDIA_ACCEL_REDIRECT_PREFIX aliased to MEDIA_ROOT, "x-sendfile"
+# to Apache/lighttpd; empty serves them from Python.
+# Files under MEDIA_PRIVATE_PREFIXES (and content-addressed blobs saved only there)
+# are served to authenticated requests only; staging files are never served. Any
+# authenticated user can fetch a private file by URL, and a front-end server must
+# not expose MEDIA_ROOT directly (keep the nginx location internal)
+MEDIA_PRIVATE_PREFIXES = (
+    "rent_agreements/", "property_documents/", "problem_reports/", "grievance_evidence/", "notice_responses/",
+)
+MEDIA_OFFLOAD = env("MEDIA_OFFLOAD", default="")
+MEDIA_ACCEL_REDIRECT_PREFIX = env("MEDIA_ACCEL_REDIRECT_PREFIX", default="/protected-media/")
+MEDIA_CACHE_MAX_AGE = env.int("MEDIA_CACHE_MAX_AGE", default=3600)
+
+# Chunked media uploads (/api/media-uploads/): keep the staging directory on the
+# same filesystem as MEDIA_ROOT so a finished upload is moved, not copied
+MEDIA_UPLOAD_STAGING_DIR = env("MEDIA_UPLOAD_STAGING_DIR", default=str(BASE_DIR / "media_staging"))
+MEDIA_UPLOAD_MAX_SIZE = env.int("MEDIA_UPLOAD_MAX_SIZE", default=2 * 1024 ** 3)
 
 # Gemini API Key
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
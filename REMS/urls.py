@@ -64,10 +64,14 @@ urlpatterns += [
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 ]
+import re
 from django.conf import settings
-from django.conf.urls.static import static
+from MBP.media import serve_media
 urlpatterns += path('ckeditor/', include('ckeditor_uploader.urls')),
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Range requests, conditional GET and X-Accel-Redirect / X-Sendfile offload (see MBP.media)
+urlpatterns += [
+    re_path(r'^%s(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve_media, name='media'),
+]
 
 urlpatterns += [
     path('api/auth/', include('dj_rest_auth.urls')),  # login/logout/token verify
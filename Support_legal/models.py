@@ -6,9 +6,12 @@ from ai_utils import ask_openai
 import uuid
 from django.conf import settings
 from django.utils import timezone
+from MBP.audit import audited
+from MBP.storage import media_storage
 
 User = get_user_model()
 
+@audited
 class RequestInfo(models.Model):
     INFO_TYPES = [
         ("property_details", "Property Details & Pricing"),
@@ -81,6 +84,7 @@ class RequestInfo(models.Model):
     def _str_(self):
         return f"Inquiry from {self.full_name} - {self.email}"
 
+@audited
 class Feedback(models.Model):
     FEEDBACK_TYPES = [
         ("general", "General Feedback"),
@@ -135,6 +139,7 @@ class Feedback(models.Model):
     def __str__(self):
         return f"{self.feedback_type} - {self.subject} ({self.name})"
 
+@audited
 class ProblemReport(models.Model):
     PROBLEM_TYPES = [
         ("technical", "Technical Issue"),
@@ -177,7 +182,7 @@ class ProblemReport(models.Model):
     additional_information = models.TextField(blank=True, null=True)
 
     # File upload
-    attachment = models.FileField(upload_to="problem_reports/", blank=True, null=True)
+    attachment = models.FileField(upload_to="problem_reports/", storage=media_storage, blank=True, null=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
     slug = models.SlugField(unique=True, blank=True)
@@ -190,6 +195,7 @@ class ProblemReport(models.Model):
     def __str__(self):
         return f"{self.problem_type} - {self.problem_summary} ({self.priority})"
 
+@audited
 class Testimonial(models.Model):
     SENTIMENT_CHOICES = [('Positive', 'Positive'), ('Neutral', 'Neutral'), ('Negative', 'Negative')]
 
@@ -205,6 +211,7 @@ class Testimonial(models.Model):
             self.slug = slugify(f"testimonial-{uuid.uuid4()}")
         super().save(*args, **kwargs)
 
+@audited
 class Grievance(models.Model):
     PRIORITY_LEVELS = [
         ("low", "Low"),
@@ -260,6 +267,7 @@ class Grievance(models.Model):
     def __str__(self):
         return f"{self.title} ({self.priority})"
 
+@audited
 class CustomerServiceLog(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     action_taken = models.TextField()
@@ -273,6 +281,7 @@ class CustomerServiceLog(models.Model):
         super().save(*args, **kwargs)
 
 
+@audited
 class NoticeResponse(models.Model):
     STATUS_CHOICES = [('Pending', 'Pending'), ('Resolved', 'Resolved'), ('Dismissed', 'Dismissed')]
     RESPONSE_TYPES = [
@@ -306,6 +315,7 @@ class NoticeResponse(models.Model):
     def __str__(self):
         return f"Response to Notice {self.notice_id} - {self.response_type}"
 
+@audited
 class ChatInteractionLog(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     query = models.TextField()
@@ -325,6 +335,7 @@ class ChatInteractionLog(models.Model):
 
         super().save(*args, **kwargs)
 
+@audited
 class SupportTicket(models.Model):
     CATEGORY_CHOICES = [
         ("property_search", "Property Search"),
@@ -1,6 +1,8 @@
 from .models import *
 from .serializers import *
 from MBP.views import ProtectedModelViewSet
+from MBP.utils import aggregate_buckets
+from django.db.models import Count, Q
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
@@ -18,13 +20,14 @@ class FeedbackViewSet(ProtectedModelViewSet):
     
     @action(detail=False, methods=['get'], url_path='sentiment-summary')
     def sentiment_summary(self, request):
-        qs = self.get_queryset()
-        return Response({
-            'total_feedbacks': qs.count(),
-            'positive': qs.filter(ai_sentiment='Positive').count(),
-            'neutral': qs.filter(ai_sentiment='Neutral').count(),
-            'negative': qs.filter(ai_sentiment='Negative').count(),
-        })
+        counts = aggregate_buckets(
+            self.get_queryset(),
+            total_feedbacks=Q(),
+            positive=Q(ai_sentiment='Positive'),
+            neutral=Q(ai_sentiment='Neutral'),
+            negative=Q(ai_sentiment='Negative'),
+        )
+        return Response(counts)
 
 class ReportProblemViewSet(ProtectedModelViewSet):
     queryset = ProblemReport.objects.all()
@@ -3,7 +3,7 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 from django.contrib.auth import authenticate, logout, login
 from rest_framework.permissions import IsAuthenticated
-from MBP.permissions import HasModelPermission
+from MBP.permissions import HasModelPermission, get_role_permission_payload
 from MBP.models import Role, RoleModelPermission
 from accounts.serializers import UserSerializer, RegisterUserSerializer
 from rest_framework.views import APIView
@@ -188,7 +188,7 @@ class LoginView(APIView):
 
         # Step 1: Check if user exists
         try:
-            user = User.objects.get(email=email)
+            user = User.objects.select_related("role").get(email=email)
         except User.DoesNotExist:
             return Response(
                 {"error": "Invalid credentials"},
@@ -226,7 +226,7 @@ class LoginView(APIView):
         # Step 6: Issue JWT tokens
         refresh = RefreshToken.for_user(user)
 
-        # Step 7: Audit log
+        # Step 7: Audit log (queued; written off the request path by MBP.audit)
         log_audit(
             request=request,
             action="login",
@@ -235,16 +235,8 @@ class LoginView(APIView):
             details=f"{user.email} logged in"
         )
 
-        # Step 8: Collect permissions for role
-        role = user.role
-        accessible_models = []
-        if role:
-            role_perms = RoleModelPermission.objects.filter(role=role)
-            for rp in role_perms:
-                accessible_models.append({
-                    "model_name": rp.model.name,
-                    "permission": rp.permission_type.code
-                })
+        # Step 8: Collect permissions for role (compiled once per permission version)
+        accessible_models = get_role_permission_payload(user.role_id) if user.role_id else []
 
         # Step 9: Return response
         return Response({
@@ -1,24 +1,65 @@
 import random
 from decimal import Decimal
+import numpy as np
+from django.utils import timezone
+import price_model
 from textblob import TextBlob
 import pytesseract
 from PIL import Image
 
+# Property fields the price predictor reads: the trained model's features,
+# then the listed price used by the fallback
+PRICE_FEATURES = price_model.FEATURES + ("price",)
+
+def predict_property_prices(rows):
+    """
+    Vectorized price predictor over an (n, len(PRICE_FEATURES)) array of
+    feature rows. Uses the trained ridge model (see price_model) and falls
+    back to 10% above the listed price until one has been trained.
+    """
+    rows = np.asarray(rows, dtype=object).reshape(-1, len(PRICE_FEATURES))
+    model = price_model.get_model()
+    if model is not None:
+        return model.predict(rows[:, :-1])
+    prices = np.where(np.equal(rows[:, -1], None), 0.0, rows[:, -1]).astype(np.float64)
+    return np.round(prices * 1.10, 2)
+
 def predict_property_price(property_instance):
     """
-    Dummy price predictor: you can replace this with your ML model.
-    For demonstration, we calculate a price that's 10% above the base price.
+    Single-row wrapper around predict_property_prices.
     """
-    base_price = property_instance.price or Decimal("0.00")
-    predicted_price = base_price * Decimal("1.10")
-    return predicted_price.quantize(Decimal("0.01"))
+    row = [[getattr(property_instance, field) for field in PRICE_FEATURES]]
+    return Decimal(f"{predict_property_prices(row)[0]:.2f}")
+
+# Recommendation score: weighted engagement signals (saturating at roughly
+# 3x their constant) plus listing freshness; the weights sum to 1.
+RECOMMENDATION_WEIGHTS = {"wishlists": 0.3, "visits": 0.35, "comparisons": 0.15, "freshness": 0.2}
+RECOMMENDATION_SATURATION = {"wishlists": 10.0, "visits": 5.0, "comparisons": 10.0}
+FRESHNESS_HALF_LIFE_DAYS = 30.0
 
-def calculate_recommendation_score(property_instance):
+def recommendation_scores(wishlists, visits, comparisons, age_days):
     """
-    Dummy recommendation score: returns a random float between 0 and 1.
-    Replace this with a recommendation algorithm for production.
+    Vectorized, deterministic recommendation scores in [0, 1] from per-listing
+    wishlist, visit request and comparison counts and listing age in days.
     """
-    return round(random.uniform(0.0, 1.0), 2)
+    weights = RECOMMENDATION_WEIGHTS
+    engagement = {"wishlists": wishlists, "visits": visits, "comparisons": comparisons}
+    scores = weights["freshness"] * np.exp2(
+        -np.maximum(np.asarray(age_days, dtype=np.float64), 0.0) / FRESHNESS_HALF_LIFE_DAYS
+    )
+    for name, counts in engagement.items():
+        counts = np.asarray(counts, dtype=np.float64)
+        scores = scores + weights[name] * (1.0 - np.exp(-counts / RECOMMENDATION_SATURATION[name]))
+    return np.round(scores, 4)
+
+def calculate_recommendation_score(property_instance, wishlists=0, visits=0, comparisons=0):
+    """
+    Single-listing wrapper around recommendation_scores. New listings have
+    no engagement yet; property.recommendations refreshes the counts in batch.
+    """
+    now = timezone.now()
+    age_days = (now - (property_instance.listed_on or now)).total_seconds() / 86400
+    return float(recommendation_scores([wishlists], [visits], [comparisons], [age_days])[0])
 
 def analyze_sentiment(text):
     """
@@ -42,13 +83,21 @@ def classify_property_image(image_path):
     possible_tags = ["Bedroom", "Kitchen", "Living Room", "Bathroom", "Exterior"]
     return random.choice(possible_tags)
 
+def ocr_document(file_path):
+    """
+    Tesseract OCR (via pytesseract) of an image file. Raises on failure so
+    the OCR worker (property.ocr) can retry the job.
+    """
+    with Image.open(file_path) as image:
+        return pytesseract.image_to_string(image)
+
 def extract_text_from_document(file_path):
     """
     Uses Tesseract OCR (via pytesseract) to extract text from an image/pdf.
     Assumes the file is an image file.
     """
     try:
-        text = pytesseract.image_to_string(Image.open(file_path))
+        text = ocr_document(file_path)
     except Exception:
         text = ""
     return text
@@ -3,9 +3,12 @@ from django.utils.text import slugify
 from django.contrib.auth import get_user_model
 from property.models import Property
 import uuid
+from MBP.audit import audited
+from MBP.storage import media_storage
 
 User = get_user_model()
 
+@audited
 class VisitRequest(models.Model):
     STATUS_CHOICES = [
         ('Pending', 'Pending'),
@@ -29,6 +32,7 @@ class VisitRequest(models.Model):
     def __str__(self):
         return f"{self.user} → {self.property} @ {self.preferred_time}"
 
+@audited
 class Appointment(models.Model):
     STATUS_CHOICES = [
         ('Scheduled', 'Scheduled'),
@@ -50,6 +54,7 @@ class Appointment(models.Model):
     def __str__(self):
         return f"{self.user} ↔ {self.agent} @ {self.appointment_time}"
 
+@audited
 class RentAgreement(models.Model):
     property = models.ForeignKey(Property, on_delete=models.CASCADE)
     tenant = models.ForeignKey(User, on_delete=models.CASCADE, related_name='agreements_as_tenant')
@@ -60,7 +65,7 @@ class RentAgreement(models.Model):
     security_deposit = models.DecimalField(max_digits=10, decimal_places=2)
     terms = models.TextField()
     signed = models.BooleanField(default=False)
-    document = models.FileField(upload_to='rent_agreements/')
+    document = models.FileField(upload_to='rent_agreements/', storage=media_storage)
     slug = models.SlugField(unique=True, blank=True)
 
     def save(self, *args, **kwargs):
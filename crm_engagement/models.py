@@ -4,9 +4,11 @@ from django.contrib.auth import get_user_model
 from property.models import Property
 import uuid
 from django.conf import settings
+from MBP.audit import audited
 
 User = get_user_model()
 
+@audited(ignore_fields=["deals_closed", "properties_handled", "rating", "total_reviews", "total_earnings", "updated_at"])
 class AgentProfile(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="agent_profile")
     specialization = models.CharField(max_length=255, blank=True)   # main specialization
@@ -32,6 +34,7 @@ class AgentProfile(models.Model):
 
     total_earnings = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
     slug = models.SlugField(unique=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Agent: {self.user.full_name}"
@@ -50,9 +53,10 @@ class AgentProfile(models.Model):
         else:
             self.rating = 0.0
             self.total_reviews = 0
-        self.save(update_fields=["rating", "total_reviews"])
+        self.save(update_fields=["rating", "total_reviews", "updated_at"])
 
 
+@audited
 class AgentReview(models.Model):
     agent = models.ForeignKey(AgentProfile, on_delete=models.CASCADE, related_name="reviews")
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -69,6 +73,7 @@ class AgentReview(models.Model):
 
 
 
+@audited
 class Lead(models.Model):
     STATUS_CHOICES = [
         ('New', 'New'),
@@ -94,6 +99,7 @@ class Lead(models.Model):
     def __str__(self):
         return self.name
 
+@audited
 class InteractionLog(models.Model):
     INTERACTION_CHOICES = [
         ('Call', 'Call'),
@@ -118,11 +124,13 @@ class InteractionLog(models.Model):
     def __str__(self):
         return f"{self.lead.name} - {self.interaction_type}"
 
+@audited
 class Notification(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     message = models.TextField()
     is_read = models.BooleanField(default=False)
     slug = models.SlugField(unique=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -132,6 +140,7 @@ class Notification(models.Model):
     def __str__(self):
         return f"To {self.user.username}"
 
+@audited
 class Wishlist(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     property = models.ForeignKey(Property, on_delete=models.CASCADE)
@@ -149,6 +158,7 @@ class Wishlist(models.Model):
     def __str__(self):
         return f"{self.user.full_name} ♥ {self.property.title}"
 
+@audited
 class PropertyComparison(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     property_1 = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='compared_as_first')
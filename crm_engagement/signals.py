@@ -24,3 +24,23 @@ def create_agent_profile(sender, instance, created, **kwargs):
     """
     if instance.role and instance.role.name.lower() == "agent":
         AgentProfile.objects.get_or_create(user=instance)
+
+
+from django.db.models.signals import post_delete
+from .models import AgentReview
+from django.utils import timezone
+from MBP.cache import invalidate_tags
+
+@receiver(post_save, sender=AgentProfile)
+@receiver(post_delete, sender=AgentProfile)
+@receiver(post_save, sender=AgentReview)
+@receiver(post_delete, sender=AgentReview)
+def invalidate_agent_responses(sender, **kwargs):
+    invalidate_tags("agent")
+
+
+@receiver(post_delete, sender=AgentReview)
+def touch_reviewed_agent(sender, instance, **kwargs):
+    # Saves refresh the agent through update_rating_and_reviews(); deletes
+    # still have to advance updated_at for the profile's ETag / Last-Modified.
+    AgentProfile.objects.filter(pk=instance.agent_id).update(updated_at=timezone.now())
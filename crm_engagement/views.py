@@ -1,6 +1,9 @@
 from .models import *
 from .serializers import *
 from MBP.views import ProtectedModelViewSet
+from MBP.utils import aggregate_buckets
+from MBP.cache import cached_response
+from django.db.models import Q
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
@@ -18,11 +21,18 @@ class AgentProfileViewSet(ProtectedModelViewSet):
         Public API: Get detailed agent profile with reviews.
         Example: /api/agents/{slug}/profile/
         """
-        agent = self.get_object()
-        serializer = AgentProfileSerializer(agent, context={"request": request})
-        return Response(serializer.data)
+        def render():
+            agent = self.get_object()
+            serializer = AgentProfileSerializer(agent, context={"request": request})
+            return Response(serializer.data)
+
+        last_modified = self.get_object_version()
+        if last_modified is None:
+            return render()
+        return self.conditional_response(request, last_modified, 1, render)
 
     @action(detail=False, methods=["get"], url_path="top", permission_classes=[AllowAny])
+    @cached_response(timeout=300, tags=["agent"])
     def top_agents(self, request):
         """
         Public API: Show top agents (verified, most deals, best ratings).
@@ -47,6 +57,7 @@ class AgentProfileViewSet(ProtectedModelViewSet):
         return Response({"message": f"Agent {agent.user.full_name} verified"})
     
     @action(detail=False, methods=["get"], url_path="leaderboard", permission_classes=[AllowAny])
+    @cached_response(timeout=300, tags=["agent"])
     def leaderboard(self, request):
         """
         Public API: Returns leaderboard of agents ranked by earnings, deals, and rating.
@@ -119,8 +130,8 @@ class LeadViewSet(ProtectedModelViewSet):
     
     @action(detail=False, methods=['get'], url_path='conversion-rate')
     def conversion_rate(self, request):
-        total = self.get_queryset().count()
-        converted = self.get_queryset().filter(status__iexact="Converted").count()
+        counts = aggregate_buckets(self.get_queryset(), total=Q(), converted=Q(status__iexact="Converted"))
+        total, converted = counts["total"], counts["converted"]
         rate = round((converted / total) * 100, 2) if total else 0
         return Response({
             "total_leads": total,
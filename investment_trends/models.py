@@ -1,7 +1,9 @@
 from django.db import models
 from django.utils.text import slugify
 import uuid
+from MBP.audit import audited
 
+@audited
 class PriceTrend(models.Model):
     area = models.CharField(max_length=100)
     price_per_sqft = models.DecimalField(max_digits=10, decimal_places=2)
@@ -17,6 +19,7 @@ class PriceTrend(models.Model):
     def __str__(self):
         return f"{self.area} - {self.trend_date}"
 
+@audited
 class InvestmentOpportunity(models.Model):
     RISK_LEVEL_CHOICES = [
         ('Low', 'Low'),
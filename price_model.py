@@ -0,0 +1,205 @@
+"""
+Ridge regression price estimator for property listings.
+
+Features are area_sqft, bedrooms, bathrooms and floor_no (numeric) plus
+one-hot encoded furnishing and city; the target is log(1 + price).
+Training is streamed: `RidgeTrainer.partial_fit` only accumulates the
+normal equations (X^T X, X^T y) of each chunk, so memory does not grow
+with the number of rows, and `fit()` standardizes and solves them once.
+
+An artifact is a directory holding `coef.npy` (memory-mapped on load)
+and `meta.json` (feature vocabularies). Each save writes a new
+`versions/<name>/` directory under PRICE_MODEL_DIR and then switches the
+`CURRENT` pointer file to it with one rename, so a reader always gets
+coefficients and vocabularies of the same training run. `get_model()`
+loads the current artifact lazily on first use and again whenever
+`CURRENT` moves.
+"""
+import json
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime, timezone
+import numpy as np
+from django.conf import settings
+
+NUMERIC_FEATURES = ("area_sqft", "bedrooms", "bathrooms", "floor_no")
+CATEGORICAL_FEATURES = ("furnishing", "city")
+FEATURES = NUMERIC_FEATURES + CATEGORICAL_FEATURES
+
+# Largest value Property.ai_price_estimate (12 digits, 2 decimals) can hold
+MAX_PRICE = 9999999999.99
+
+COEF_FILE = "coef.npy"
+META_FILE = "meta.json"
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+# Older versions kept next to the current one (a reader may still be loading one)
+KEEP_VERSIONS = 2
+
+
+def design_matrix(rows, vocabularies):
+    """
+    (n, p) float matrix for raw feature rows in FEATURES order: an intercept
+    column, the numeric features, then one indicator column per vocabulary
+    entry. Unknown or missing categories leave their indicators at zero.
+    """
+    rows = np.asarray(rows, dtype=object).reshape(-1, len(FEATURES))
+    missing = np.equal(rows, None)
+    split = len(NUMERIC_FEATURES)
+    numeric = np.where(missing[:, :split], 0.0, rows[:, :split]).astype(np.float64)
+
+    blocks = [np.ones((rows.shape[0], 1)), numeric]
+    for offset, name in enumerate(CATEGORICAL_FEATURES, start=split):
+        vocabulary = np.asarray(vocabularies[name], dtype=str)
+        indicators = np.zeros((rows.shape[0], len(vocabulary)))
+        if len(vocabulary):
+            column = np.where(missing[:, offset], "", rows[:, offset]).astype(str)
+            positions = np.minimum(np.searchsorted(vocabulary, column), len(vocabulary) - 1)
+            known = vocabulary[positions] == column
+            indicators[np.nonzero(known)[0], positions[known]] = 1.0
+        blocks.append(indicators)
+    return np.hstack(blocks)
+
+
+class PriceModel:
+    def __init__(self, coef, vocabularies, meta=None):
+        self.coef = coef
+        self.vocabularies = {name: sorted(values) for name, values in vocabularies.items()}
+        self.meta = meta or {}
+
+    def predict(self, rows):
+        """
+        Estimated prices for an array of raw feature rows (FEATURES order).
+        """
+        log_price = design_matrix(rows, self.vocabularies) @ self.coef
+        return np.clip(np.expm1(log_price), 0.0, MAX_PRICE).round(2)
+
+    def save(self, directory):
+        """
+        Write the artifact as a new version of `directory` and make it the
+        current one; returns the version name.
+        """
+        name = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+        version_dir = os.path.join(directory, VERSIONS_DIR, name)
+        os.makedirs(version_dir)
+        with open(os.path.join(version_dir, COEF_FILE), "wb") as fh:
+            np.save(fh, np.asarray(self.coef, dtype=np.float64))
+        with open(os.path.join(version_dir, META_FILE), "w") as fh:
+            json.dump({**self.meta, "features": FEATURES, "vocabularies": self.vocabularies}, fh)
+
+        pointer_tmp = os.path.join(directory, f".{CURRENT_FILE}.{name}.tmp")
+        with open(pointer_tmp, "w") as fh:
+            fh.write(name)
+        os.replace(pointer_tmp, os.path.join(directory, CURRENT_FILE))
+        _prune_versions(directory, name)
+        return name
+
+    @classmethod
+    def load(cls, directory):
+        path = artifact_dir(directory)
+        with open(os.path.join(path, META_FILE)) as fh:
+            meta = json.load(fh)
+        if tuple(meta.pop("features")) != FEATURES:
+            raise ValueError(f"Price model in {path} was trained on different features")
+        coef = np.load(os.path.join(path, COEF_FILE), mmap_mode="r")
+        return cls(coef, meta.pop("vocabularies"), meta)
+
+
+def artifact_dir(directory):
+    """
+    The directory of the current artifact: the version `CURRENT` points at,
+    or `directory` itself for an unversioned artifact.
+    """
+    try:
+        with open(os.path.join(directory, CURRENT_FILE)) as fh:
+            return os.path.join(directory, VERSIONS_DIR, fh.read().strip())
+    except FileNotFoundError:
+        return directory
+
+
+def _prune_versions(directory, current):
+    versions = sorted(name for name in os.listdir(os.path.join(directory, VERSIONS_DIR)) if name != current)
+    for name in versions[:max(len(versions) - KEEP_VERSIONS, 0)]:
+        shutil.rmtree(os.path.join(directory, VERSIONS_DIR, name), ignore_errors=True)
+
+
+class RidgeTrainer:
+    """
+    Streaming ridge regression: call `partial_fit` once per chunk of rows,
+    then `fit()`.
+
+        trainer = RidgeTrainer({"furnishing": [...], "city": [...]}, alpha=1.0)
+        for rows, prices in chunks:
+            trainer.partial_fit(rows, prices)
+        model = trainer.fit()
+    """
+
+    def __init__(self, vocabularies, alpha=1.0):
+        self.vocabularies = {name: sorted(values) for name, values in vocabularies.items()}
+        self.alpha = alpha
+        width = 1 + len(NUMERIC_FEATURES) + sum(len(v) for v in self.vocabularies.values())
+        self.gram = np.zeros((width, width))
+        self.moment = np.zeros(width)
+        self.rows = 0
+
+    def partial_fit(self, rows, prices):
+        design = design_matrix(rows, self.vocabularies)
+        target = np.log1p(np.asarray(prices, dtype=np.float64))
+        self.gram += design.T @ design
+        self.moment += design.T @ target
+        self.rows += design.shape[0]
+
+    def fit(self):
+        if self.rows == 0:
+            raise ValueError("No training rows")
+        # Column means/deviations come from the accumulated sums (row 0 is
+        # the intercept), so standardizing needs no second pass over the data.
+        mean = self.gram[0] / self.rows
+        variance = np.diag(self.gram) / self.rows - mean ** 2
+        scale = np.where(variance > 1e-12, np.sqrt(np.maximum(variance, 0)), 1.0)
+        mean[0], scale[0] = 0.0, 1.0
+
+        # Z = X @ T standardizes every column except the intercept
+        transform = np.diag(1.0 / scale)
+        transform[0, 1:] = -mean[1:] / scale[1:]
+        penalty = self.alpha * np.eye(len(scale))
+        penalty[0, 0] = 0.0
+        weights = np.linalg.solve(transform.T @ self.gram @ transform + penalty, transform.T @ self.moment)
+
+        meta = {
+            "alpha": self.alpha,
+            "trained_rows": self.rows,
+            "trained_at": datetime.now(timezone.utc).isoformat(),
+        }
+        return PriceModel(transform @ weights, self.vocabularies, meta)
+
+
+def model_dir():
+    return getattr(settings, "PRICE_MODEL_DIR", None)
+
+
+_loaded = {"model": None, "version": None}
+_load_lock = threading.Lock()
+
+
+def get_model():
+    """
+    The trained PriceModel, or None when no artifact has been written yet.
+    """
+    directory = model_dir()
+    if not directory:
+        return None
+    path = artifact_dir(directory)
+    try:
+        version = (path, os.stat(os.path.join(path, META_FILE)).st_mtime_ns)
+    except FileNotFoundError:
+        return None
+    if _loaded["version"] != version:
+        with _load_lock:
+            if _loaded["version"] != version:
+                # A version directory is never rewritten, so this loads one consistent artifact
+                _loaded["model"] = PriceModel.load(path)
+                _loaded["version"] = version
+    return _loaded["model"]
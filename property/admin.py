@@ -1,7 +1,8 @@
 from django.contrib import admin
 from .models import (
     Property, PropertyType, Address, PropertyImage, PropertyVideo,
-    PropertyAmenity, PropertyDocument, PostedProperty, PropertyContact
+    PropertyAmenity, PropertyDocument, PostedProperty, PropertyContact,
+    PropertyStatsRollup, DocumentOCRJob, MediaUpload
 )
 
 @admin.register(Property)
@@ -54,4 +55,25 @@ class ContactAdmin(admin.ModelAdmin):
     list_display = ('owner_name', 'email', 'phone_number', 'property', 'is_active', 'created_at')
     search_fields = ('owner_name', 'email', 'phone_number', 'property__name')
     list_filter = ('is_active', 'created_at')
-    readonly_fields = ('created_at', 'updated_at', 'slug')
\ No newline at end of file
+    readonly_fields = ('created_at', 'updated_at', 'slug')
+
+@admin.register(PropertyStatsRollup)
+class PropertyStatsRollupAdmin(admin.ModelAdmin):
+    list_display = ['category', 'property_status', 'property_type', 'city', 'total_properties']
+    list_filter = ['category', 'property_status', 'property_type']
+    search_fields = ['city']
+    readonly_fields = [field.name for field in PropertyStatsRollup._meta.fields]
+
+@admin.register(DocumentOCRJob)
+class DocumentOCRJobAdmin(admin.ModelAdmin):
+    list_display = ['content_hash', 'status', 'attempts', 'available_at', 'updated_at']
+    list_filter = ['status']
+    search_fields = ['content_hash', 'source_name']
+    readonly_fields = ['content_hash', 'source_name', 'extracted_text', 'last_error', 'started_at', 'created_at', 'updated_at']
+
+@admin.register(MediaUpload)
+class MediaUploadAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'kind', 'property', 'owner', 'offset', 'size', 'status', 'updated_at']
+    list_filter = ['kind', 'status']
+    search_fields = ['filename', 'property__title', 'owner__email']
+    readonly_fields = ['offset', 'status', 'attachment_slug', 'created_at', 'updated_at']
@@ -0,0 +1,117 @@
+"""
+Geohash helpers for radius and bounding-box property queries.
+
+Each Property stores the geohash of its coordinates in an indexed column,
+so a bounding box becomes a handful of `geohash LIKE 'prefix%'` B-tree
+range scans; exact distances are then computed on the small candidate set.
+"""
+import math
+
+GEOHASH_PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    latitude, longitude = float(latitude), float(longitude)
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lon_range[0] = mid
+            else:
+                bits <<= 1
+                lon_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def cell_size(precision):
+    """
+    (lat_degrees, lon_degrees) covered by one geohash cell of `precision`.
+    """
+    total_bits = 5 * precision
+    lon_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (float(lat1), float(lon1), float(lat2), float(lon2)))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """
+    (min_lat, min_lon, max_lat, max_lon) enclosing the circle.
+    """
+    latitude, longitude = float(latitude), float(longitude)
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(latitude))
+    lon_delta = 180.0 if cos_lat < 1e-9 else min(180.0, lat_delta / cos_lat)
+    return (
+        max(-90.0, latitude - lat_delta),
+        max(-180.0, longitude - lon_delta),
+        min(90.0, latitude + lat_delta),
+        min(180.0, longitude + lon_delta),
+    )
+
+
+def covering_prefixes(min_lat, min_lon, max_lat, max_lon):
+    """
+    Geohash prefixes whose cells together cover the box: the finest precision
+    at which one cell is at least as large as the box, so at most 4 prefixes.
+    Returns [] when the box is too large for a prefix filter to help, or
+    is not a finite box.
+    """
+    if not all(math.isfinite(v) for v in (min_lat, min_lon, max_lat, max_lon)):
+        return []
+    height, width = max_lat - min_lat, max_lon - min_lon
+    precision = 0
+    for candidate in range(1, GEOHASH_PRECISION + 1):
+        lat_size, lon_size = cell_size(candidate)
+        if lat_size < height or lon_size < width:
+            break
+        precision = candidate
+    if precision == 0:
+        return []
+
+    lat_size, lon_size = cell_size(precision)
+    prefixes = set()
+    lat = min_lat
+    while True:
+        lon = min_lon
+        while True:
+            prefixes.add(encode(lat, lon, precision))
+            if lon >= max_lon:
+                break
+            lon = min(lon + lon_size, max_lon)
+        if lat >= max_lat:
+            break
+        lat = min(lat + lat_size, max_lat)
+    return sorted(prefixes)
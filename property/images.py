@@ -0,0 +1,159 @@
+"""
+Resized derivatives of PropertyImage uploads.
+
+Each upload gets one derivative per entry of DERIVATIVE_WIDTHS (never
+upscaled), in the original's format family (JPEG, or PNG when the image
+has transparency) plus WebP. Files are stored next to the original as
+`<name>__<label>.<ext>` and recorded in `PropertyImage.derivatives`:
+
+    {"source": "property_images/a.jpg",
+     "thumb": {"width": 320, "height": 240,
+               "src": "property_images/a__thumb.jpg",
+               "webp": "property_images/a__thumb.webp"}, ...}
+
+Uploads are content-addressed (MBP.storage), so images with the same
+content share one source name and one set of derivatives: an image whose
+file was already rendered for another listing reuses that entry (and its
+ai_tag), and derivatives are only removed with the last image using them.
+
+Generation (and the ai_tag classification of new uploads) runs after the
+save commits on a small thread pool, off the request path;
+`python manage.py generate_image_derivatives` backfills images that have
+none (or whose file changed).
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+from ai_utils import classify_property_image
+from MBP.cache import invalidate_tags
+from .models import Property, PropertyImage
+from .ocr import local_path
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_WIDTHS = getattr(settings, "IMAGE_DERIVATIVE_WIDTHS", {"thumb": 320, "medium": 768, "large": 1600})
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+
+_pool = None
+
+
+def is_current(image):
+    return bool(image.image) and image.derivatives.get("source") == image.image.name
+
+
+def derivative_name(source, label, extension):
+    base, _ = os.path.splitext(source)
+    return f"{base}__{label}.{extension}"
+
+
+def _store(name, picture, file_format, **options):
+    buffer = BytesIO()
+    picture.save(buffer, format=file_format, **options)
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def render(source):
+    """
+    Write the derivatives of the stored image `source`; returns the mapping.
+    """
+    with default_storage.open(source, "rb") as fh, Image.open(fh) as original:
+        picture = ImageOps.exif_transpose(original)
+        has_alpha = picture.mode in ("RGBA", "LA") or (picture.mode == "P" and "transparency" in picture.info)
+        picture = picture.convert("RGBA" if has_alpha else "RGB")
+
+    derivatives = {"source": source}
+    for label, width in DERIVATIVE_WIDTHS.items():
+        resized = picture.copy()
+        resized.thumbnail((width, width * 4), Image.Resampling.LANCZOS)
+        if has_alpha:
+            src = _store(derivative_name(source, label, "png"), resized, "PNG", optimize=True)
+        else:
+            src = _store(derivative_name(source, label, "jpg"), resized, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        webp = _store(derivative_name(source, label, "webp"), resized, "WEBP", quality=WEBP_QUALITY, method=4)
+        derivatives[label] = {"width": resized.width, "height": resized.height, "src": src, "webp": webp}
+    return derivatives
+
+
+def remove(derivatives):
+    if PropertyImage.objects.filter(image=derivatives.get("source")).exists():
+        return  # still shown by another image with the same content
+    for label, entry in derivatives.items():
+        if label == "source":
+            continue
+        for name in (entry.get("src"), entry.get("webp")):
+            if name and default_storage.exists(name):
+                default_storage.delete(name)
+
+
+def generate(image_id):
+    """
+    Build and record the derivatives of one PropertyImage, replacing
+    those of a previous file, and tag it if it has no ai_tag yet.
+    """
+    image = PropertyImage.objects.filter(pk=image_id).only("id", "image", "derivatives", "ai_tag", "property_id").first()
+    if image is None or not image.image or is_current(image):
+        return
+    source = image.image.name
+    shared = (
+        PropertyImage.objects.filter(image=source, derivatives__source=source)
+        .exclude(pk=image_id)
+        .values_list("derivatives", "ai_tag")
+        .first()
+    )
+    derivatives, shared_tag = shared if shared else (render(source), "")
+    ai_tag = image.ai_tag or shared_tag
+    if not ai_tag:
+        try:
+            with local_path(source) as path:
+                ai_tag = classify_property_image(path)
+        except Exception:
+            ai_tag = ""
+    # Skip the write if the image was replaced while rendering
+    if PropertyImage.objects.filter(pk=image_id, image=source).update(derivatives=derivatives, ai_tag=ai_tag):
+        remove(image.derivatives)
+        Property.objects.filter(pk=image.property_id).update(last_updated=timezone.now())
+        invalidate_tags("property")
+    else:
+        remove(derivatives)
+
+
+def _run(image_id):
+    try:
+        generate(image_id)
+    except Exception:
+        logger.exception("Failed to generate derivatives for PropertyImage %s", image_id)
+    finally:
+        connection.close()
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(
+            max_workers=getattr(settings, "IMAGE_DERIVATIVE_WORKERS", 2),
+            thread_name_prefix="image-derivatives",
+        )
+    return _pool
+
+
+def schedule(image):
+    """
+    Queue derivative generation for `image` once the current transaction
+    commits; runs inline when IMAGE_DERIVATIVES_ASYNC is disabled (e.g. in tests).
+    """
+    if not image.image or is_current(image):
+        return
+    if getattr(settings, "IMAGE_DERIVATIVES_ASYNC", True):
+        transaction.on_commit(lambda: _get_pool().submit(_run, image.pk))
+    else:
+        transaction.on_commit(lambda: generate(image.pk))
@@ -0,0 +1,36 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from property.models import Property, city_from_location
+from property import geo
+
+
+class Command(BaseCommand):
+    help = 'Fill Property.geohash and Property.city for rows saved before those columns existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        count = 0
+        last_id = 0
+        while True:
+            chunk = list(
+                Property.objects.filter(Q(geohash='') | Q(city=''), id__gt=last_id).order_by('id')
+                .only('id', 'location', 'latitude', 'longitude')[:chunk_size]
+            )
+            if not chunk:
+                break
+            for prop in chunk:
+                prop.city = city_from_location(prop.location)
+                prop.geohash = geo.encode(prop.latitude, prop.longitude)
+            # bulk_update skips save() and signals, so AI fields and audit logs are untouched
+            Property.objects.bulk_update(chunk, ['city', 'geohash'], batch_size=500)
+            count += len(chunk)
+            last_id = chunk[-1].id
+
+        self.stdout.write(self.style.SUCCESS(f"Updated location fields for {count} properties."))
+        if count:
+            # city is part of the stats rollup key and bulk_update bypasses its signals
+            call_command('rebuild_property_stats', stdout=self.stdout)
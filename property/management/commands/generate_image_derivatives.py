@@ -0,0 +1,24 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from property import images
+from property.models import PropertyImage
+
+
+class Command(BaseCommand):
+    help = 'Generate resized and WebP derivatives for property images that lack them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--force', action='store_true', help='Regenerate derivatives for every image')
+
+    def handle(self, *args, **options):
+        pending = [
+            image.pk
+            for image in PropertyImage.objects.only("id", "image", "derivatives").iterator(chunk_size=2000)
+            if image.image and (options['force'] or not images.is_current(image))
+        ]
+        if options['force']:
+            PropertyImage.objects.filter(pk__in=pending).update(derivatives={})
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            list(pool.map(images._run, pending))
+        self.stdout.write(self.style.SUCCESS(f"Generated derivatives for {len(pending)} images."))
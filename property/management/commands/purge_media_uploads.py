@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from property import uploads
+
+
+class Command(BaseCommand):
+    help = 'Delete chunked media uploads (and their staging files) untouched for a while'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Age after which an upload is removed')
+
+    def handle(self, *args, **options):
+        removed = uploads.purge_stale(max_age_hours=options['hours'])
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} media uploads."))
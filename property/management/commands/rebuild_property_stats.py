@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from property import rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the PropertyStatsRollup table from all properties'
+
+    def handle(self, *args, **kwargs):
+        count = rollups.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} property stats rollup rows."))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from property.models import Property, PropertyAmenity
+from property import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for all properties'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            self.stdout.write(self.style.WARNING("Full-text search is not supported on this database."))
+            return
+
+        chunk_size = options['chunk_size']
+        search.clear_index()
+
+        count = 0
+        last_id = 0
+        while True:
+            chunk = list(
+                Property.objects.filter(id__gt=last_id).order_by('id')
+                .only('id', 'title', 'description', 'location')[:chunk_size]
+            )
+            if not chunk:
+                break
+
+            amenities = {}
+            for property_id, name in PropertyAmenity.objects.filter(
+                property_id__in=[p.id for p in chunk]
+            ).values_list('property_id', 'amenity'):
+                amenities.setdefault(property_id, []).append(name)
+
+            for prop in chunk:
+                search.index_property(prop, amenities=amenities.get(prop.id, []))
+            count += len(chunk)
+            last_id = chunk[-1].id
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} properties."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from property import scoring
+
+
+class Command(BaseCommand):
+    help = 'Recompute ai_price_estimate for all properties with the vectorized price predictor'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=scoring.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        count = scoring.rescore_all(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Updated AI price estimates for {count} properties."))
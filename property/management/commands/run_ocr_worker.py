@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from property import ocr
+
+
+class Command(BaseCommand):
+    help = 'Run queued PropertyDocument OCR jobs in a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=None, help='Pool size (default: CPU count)')
+        parser.add_argument('--batch-size', type=int, default=None, help='Jobs claimed per round (default: 2x pool size)')
+        parser.add_argument('--poll-interval', type=float, default=5.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        processed = ocr.run_worker(
+            processes=options['processes'],
+            batch_size=options['batch_size'],
+            poll_interval=options['poll_interval'],
+            once=options['once'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} OCR jobs."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from property import recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute ai_recommended_score for listings with new engagement '
+        '(run every few minutes), or for all listings with --full (run daily)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rescore every listing')
+        parser.add_argument('--chunk-size', type=int, default=recommendations.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        scored, changed = recommendations.run(full=options['full'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Scored {scored} properties, {changed} scores changed."))
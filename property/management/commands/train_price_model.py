@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+import price_model
+from property import scoring
+from property.models import Property
+
+
+class Command(BaseCommand):
+    help = 'Train the ridge regression price estimator from Property rows, streamed in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--alpha', type=float, default=1.0)
+        parser.add_argument('--min-city-listings', type=int, default=5,
+                            help='Cities with fewer listings share the "unknown city" baseline')
+        parser.add_argument('--output', default=None, help='Artifact directory (default: PRICE_MODEL_DIR)')
+        parser.add_argument('--rescore', action='store_true', help='Rescore all properties afterwards')
+
+    def handle(self, *args, **options):
+        training = Property.objects.filter(price__gt=0).order_by()
+        cities = (
+            training.exclude(city="")
+            .values("city")
+            .annotate(listings=Count("id"))
+            .filter(listings__gte=options['min_city_listings'])
+            .values_list("city", flat=True)
+        )
+        vocabularies = {
+            "furnishing": [value for value, _ in Property.FURNISHING_CHOICES],
+            "city": list(cities),
+        }
+        trainer = price_model.RidgeTrainer(vocabularies, alpha=options['alpha'])
+
+        chunk_size = options['chunk_size']
+        rows, prices = [], []
+        for *features, price in training.values_list(*price_model.FEATURES, "price").iterator(chunk_size=chunk_size):
+            rows.append(features)
+            prices.append(price)
+            if len(rows) >= chunk_size:
+                trainer.partial_fit(rows, prices)
+                rows, prices = [], []
+        if rows:
+            trainer.partial_fit(rows, prices)
+        if trainer.rows == 0:
+            raise CommandError("No priced properties to train on.")
+
+        output = options['output'] or price_model.model_dir()
+        if not output:
+            raise CommandError("Set PRICE_MODEL_DIR or pass --output.")
+        trainer.fit().save(output)
+        self.stdout.write(self.style.SUCCESS(
+            f"Trained price model on {trainer.rows} properties ({len(vocabularies['city'])} cities) -> {output}"
+        ))
+
+        if options['rescore']:
+            count = scoring.rescore_all(chunk_size=chunk_size)
+            self.stdout.write(self.style.SUCCESS(f"Updated AI price estimates for {count} properties."))
@@ -1,11 +1,16 @@
 from django.db import models
 from django.utils.text import slugify
+from django.utils import timezone
 import uuid
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from MBP.audit import audited
+from MBP.storage import media_storage
+from . import geo
 
 # User = get_user_model()
 
+@audited
 class PropertyType(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
@@ -19,6 +24,14 @@ class PropertyType(models.Model):
     def __str__(self):
         return self.name
 
+def city_from_location(location):
+    """
+    City is the last comma-separated part of a location string.
+    """
+    raw_location = location or "Unknown"
+    parts = raw_location.split(",")
+    return parts[-1].strip() if len(parts) > 1 else raw_location.strip()
+
 class Address(models.Model):
     house_no = models.CharField(max_length=100)
     street = models.CharField(max_length=255)
@@ -38,6 +51,7 @@ class Address(models.Model):
     def __str__(self):
         return f"{self.house_no}, {self.area}, {self.city}"
 
+@audited(ignore_fields=["ai_price_estimate", "ai_recommended_score", "recommendation_scored_at"])
 class Property(models.Model):
     CATEGORY_CHOICES = [('Sale', 'Sale'), ('Rent', 'Rent'), ('Lease', 'Lease')]
     FURNISHING_CHOICES = [('Furnished', 'Furnished'), ('Semi-Furnished', 'Semi-Furnished'), ('Unfurnished', 'Unfurnished')]
@@ -52,8 +66,10 @@ class Property(models.Model):
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     address = models.ForeignKey(Address, on_delete=models.SET_NULL, null=True)
     location = models.CharField(max_length=255)
+    city = models.CharField(max_length=255, blank=True, db_index=True, editable=False)
     latitude = models.DecimalField(max_digits=10, decimal_places=6)
     longitude = models.DecimalField(max_digits=10, decimal_places=6)
+    geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False)
     area_sqft = models.FloatField()
     price = models.DecimalField(max_digits=12, decimal_places=2)
     price_per_sqft = models.DecimalField(max_digits=10, decimal_places=2)
@@ -79,6 +95,7 @@ class Property(models.Model):
     # AI fields
     ai_price_estimate = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
     ai_recommended_score = models.FloatField(null=True, blank=True)
+    recommendation_scored_at = models.DateTimeField(null=True, blank=True, editable=False)
     
     agent = models.ForeignKey(
         settings.AUTH_USER_MODEL, 
@@ -89,78 +106,163 @@ class Property(models.Model):
 
     slug = models.SlugField(unique=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # ai-properties / top-ai: WHERE property_status = 'Active' ORDER BY ai_recommended_score DESC
+            models.Index(fields=['property_status', '-ai_recommended_score'], name='property_status_score_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(f"{self.title}-{uuid.uuid4()}")
+        self.city = city_from_location(self.location)
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = geo.encode(self.latitude, self.longitude)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            # Write the derived columns along with their sources
+            update_fields = set(update_fields)
+            if "location" in update_fields:
+                update_fields.add("city")
+            if update_fields & {"latitude", "longitude"}:
+                update_fields.add("geohash")
+            kwargs["update_fields"] = sorted(update_fields)
         super().save(*args, **kwargs)
 
     def __str__(self):
         return self.title
 
+class PropertyStatsRollup(models.Model):
+    """
+    Pre-aggregated listing counters per (category, status, type, city),
+    maintained incrementally by property.rollups from Property signals.
+    """
+    category = models.CharField(max_length=20)
+    property_status = models.CharField(max_length=20, blank=True)
+    property_type = models.ForeignKey(PropertyType, on_delete=models.CASCADE, related_name='stats_rollups')
+    city = models.CharField(max_length=255, blank=True)
+
+    total_properties = models.IntegerField(default=0)
+    price_sum = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    area_sum = models.FloatField(default=0)
+    price_below_20_lakh = models.IntegerField(default=0)
+    price_20_50_lakh = models.IntegerField(default=0)
+    price_above_50_lakh = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('category', 'property_status', 'property_type', 'city')
+
+    def __str__(self):
+        return f"{self.category} / {self.property_status} / {self.city}: {self.total_properties}"
+
+@audited
 class PropertyImage(models.Model):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='images')
-    image = models.ImageField(upload_to='property_images/')
+    image = models.ImageField(upload_to='property_images/', storage=media_storage)
     caption = models.CharField(max_length=255, blank=True)
     is_primary = models.BooleanField(default=False)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     ai_tag = models.CharField(max_length=100, blank=True)
+    derivatives = models.JSONField(default=dict, blank=True, editable=False)  # resized/WebP files, see property.images
     slug = models.SlugField(unique=True, blank=True)
 
-    def save(self, *args, **kwargs):
+    def set_slug(self):
         if not self.slug:
             base_title = getattr(self.property, "title", "property")
             self.slug = slugify(f"{base_title}-{uuid.uuid4()}")
+
+    def save(self, *args, **kwargs):
+        self.set_slug()
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{getattr(self.property, 'title', 'Property')} Image"
 
+@audited
 class PropertyVideo(models.Model):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name="videos")
-    video = models.FileField(upload_to="property_videos/")
+    video = models.FileField(upload_to="property_videos/", storage=media_storage)
     caption = models.CharField(max_length=255, blank=True, null=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     slug = models.SlugField(unique=True, blank=True)
 
-    def save(self, *args, **kwargs):
+    def set_slug(self):
         if not self.slug:
             self.slug = slugify(f"property-video-{uuid.uuid4()}")
+
+    def save(self, *args, **kwargs):
+        self.set_slug()
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Video for {self.property.title} ({self.caption})"
 
+@audited
 class PropertyAmenity(models.Model):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='amenities')
     amenity = models.CharField(max_length=100)
     slug = models.SlugField(unique=True, blank=True)
 
-    def save(self, *args, **kwargs):
+    def set_slug(self):
         if not self.slug:
             self.slug = slugify(f"{self.amenity}-{uuid.uuid4()}")
+
+    def save(self, *args, **kwargs):
+        self.set_slug()
         super().save(*args, **kwargs)
 
     def __str__(self):
         return self.amenity
 
+@audited
 class PropertyDocument(models.Model):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='documents')
     document_type = models.CharField(max_length=100)
-    document_file = models.FileField(upload_to='property_documents/')
+    document_file = models.FileField(upload_to='property_documents/', storage=media_storage)
     verified = models.BooleanField(default=False)
     verified_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='verified_documents')
     verified_at = models.DateTimeField(null=True, blank=True)
     ai_extracted_text = models.TextField(blank=True)
+    ocr_job = models.ForeignKey('DocumentOCRJob', on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='documents')
     slug = models.SlugField(unique=True, blank=True)
 
-    def save(self, *args, **kwargs):
+    def set_slug(self):
         if not self.slug:
             self.slug = slugify(f"doc-{uuid.uuid4()}")
+
+    def save(self, *args, **kwargs):
+        self.set_slug()
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.document_type} - {self.property.title}"
 
+class DocumentOCRJob(models.Model):
+    """
+    One OCR run per distinct file content (sha256), shared by every
+    PropertyDocument carrying that content. Processed outside the request
+    by `python manage.py run_ocr_worker`; see property.ocr.
+    """
+    STATUS_CHOICES = [('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')]
+
+    content_hash = models.CharField(max_length=64, unique=True)
+    source_name = models.CharField(max_length=255, blank=True)  # storage name of a file with this content
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)   # retries wait until this time
+    started_at = models.DateTimeField(null=True, blank=True)
+    extracted_text = models.TextField(blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'available_at'], name='ocr_job_queue_idx')]
+
+    def __str__(self):
+        return f"OCR {self.content_hash[:12]} ({self.status})"
+
+@audited
 class PostedProperty(models.Model):
     STATUS_CHOICES = [('Pending', 'Pending'), ('Approved', 'Approved'), ('Rejected', 'Rejected')]
 
@@ -179,6 +281,7 @@ class PostedProperty(models.Model):
     def __str__(self):
         return f"{self.user} - {self.property.title}"
 
+@audited
 class PropertyContact(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name="contacts")
@@ -208,4 +311,28 @@ class PropertyContact(models.Model):
                 slug = f"{base_slug}-{num}"
                 num += 1
             self.slug = slug
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+class MediaUpload(models.Model):
+    """
+    A resumable, chunked upload of a property image or video. Chunks are
+    appended to a staging file and the finished file becomes a
+    PropertyImage / PropertyVideo; see property.uploads.
+    """
+    KIND_CHOICES = [('image', 'Image'), ('video', 'Video')]
+    STATUS_CHOICES = [('uploading', 'Uploading'), ('complete', 'Complete'), ('failed', 'Failed')]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="media_uploads")
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name="media_uploads")
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    filename = models.CharField(max_length=255)
+    caption = models.CharField(max_length=255, blank=True)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)   # bytes received so far
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='uploading')
+    attachment_slug = models.SlugField(blank=True)       # PropertyImage / PropertyVideo created on completion
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
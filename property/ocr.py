@@ -0,0 +1,271 @@
+"""
+OCR job queue for PropertyDocument.ai_extracted_text.
+
+Saving a document only hashes the uploaded file and links the document to
+the DocumentOCRJob for that content (creating a pending job if needed);
+when the content was already OCR'd the stored text is copied right away,
+so re-uploads never run Tesseract twice. `run_worker()` (the
+run_ocr_worker command) claims pending jobs from the table and runs
+ai_utils.ocr_document in a process pool; failures are retried with
+exponential backoff up to OCR_MAX_ATTEMPTS, and jobs left running by a
+dead worker go back to the queue after OCR_LEASE_SECONDS (or fail, once
+their attempts are used up). When a document crashes a pool process the
+whole batch is requeued without charging an attempt and its jobs are
+rerun one at a time, so only the job that breaks the pool on its own
+is charged.
+"""
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import ExitStack, contextmanager
+from datetime import timedelta
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from ai_utils import ocr_document
+from MBP.cache import invalidate_tags
+from MBP.storage import blob_digest
+from .models import DocumentOCRJob, PropertyDocument, Property
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = getattr(settings, "OCR_MAX_ATTEMPTS", 3)
+RETRY_DELAY_SECONDS = getattr(settings, "OCR_RETRY_DELAY_SECONDS", 60)
+LEASE_SECONDS = getattr(settings, "OCR_LEASE_SECONDS", 600)
+
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+
+
+def content_hash(field_file):
+    """
+    sha256 of a FieldFile, read in chunks; leaves an uncommitted upload
+    rewound for the storage save that follows. Stored content-addressed
+    files are not read at all.
+    """
+    if field_file._committed and blob_digest(field_file.name):
+        return blob_digest(field_file.name)
+    digest = hashlib.sha256()
+    field_file.open("rb")
+    for chunk in field_file.chunks():
+        digest.update(chunk)
+    if field_file._committed:
+        field_file.close()
+    else:
+        field_file.seek(0)
+    return digest.hexdigest()
+
+
+def attach_job(document):
+    """
+    pre_save: link `document` to the OCR job of its file content.
+    """
+    field_file = document.document_file
+    if not field_file:
+        return
+    new_upload = not field_file._committed
+    if not new_upload and (document.ocr_job_id or document.ai_extracted_text):
+        return
+    attach_jobs([document])
+
+
+def attach_jobs(documents):
+    """
+    Link unsaved documents to the jobs of their file contents in a fixed
+    number of queries (used directly by bulk inserts, which skip pre_save).
+    """
+    hashes = [(document, content_hash(document.document_file)) for document in documents if document.document_file]
+    if not hashes:
+        return
+    digests = {digest for _, digest in hashes}
+    DocumentOCRJob.objects.bulk_create(
+        [DocumentOCRJob(content_hash=digest) for digest in digests], ignore_conflicts=True
+    )
+    # Uploading failed content again gives it a fresh set of attempts
+    DocumentOCRJob.objects.filter(content_hash__in=digests, status=FAILED).update(
+        status=PENDING, attempts=0, available_at=timezone.now()
+    )
+    jobs = DocumentOCRJob.objects.in_bulk(digests, field_name="content_hash")
+    for document, digest in hashes:
+        job = jobs[digest]
+        document.ocr_job = job
+        document.ai_extracted_text = job.extracted_text if job.status == DONE else ""
+
+
+def record_source(document):
+    """
+    post_save: give a new job the stored file name the worker will read.
+    """
+    if document.ocr_job_id and document.document_file:
+        DocumentOCRJob.objects.filter(pk=document.ocr_job_id, source_name="").update(
+            source_name=document.document_file.name
+        )
+
+
+def record_sources(documents):
+    """
+    Bulk record_source for documents saved with bulk_create.
+    """
+    jobs = {}
+    for document in documents:
+        job = document.ocr_job
+        if job is not None and not job.source_name and document.document_file:
+            job.source_name = document.document_file.name
+            jobs[job.pk] = job
+    DocumentOCRJob.objects.bulk_update(list(jobs.values()), ["source_name"])
+
+
+def claim_jobs(limit, among=None):
+    """
+    Mark up to `limit` due jobs (only those in `among`, if given) running and return them.
+    """
+    now = timezone.now()
+    # Jobs whose worker died mid-run go back to the queue, unless that was their last attempt
+    expired = DocumentOCRJob.objects.filter(status=RUNNING, started_at__lt=now - timedelta(seconds=LEASE_SECONDS))
+    expired.filter(attempts__gte=MAX_ATTEMPTS).update(status=FAILED, last_error="Worker lease expired")
+    expired.update(status=PENDING)
+    with transaction.atomic():
+        queued = (
+            DocumentOCRJob.objects.filter(status=PENDING, available_at__lte=now)
+            .exclude(source_name="")
+            .order_by("available_at")
+        )
+        if among is not None:
+            queued = queued.filter(pk__in=among)
+        if connection.features.has_select_for_update_skip_locked:
+            queued = queued.select_for_update(skip_locked=True)
+        ids = list(queued.values_list("pk", flat=True)[:limit])
+        DocumentOCRJob.objects.filter(pk__in=ids, status=PENDING).update(
+            status=RUNNING, started_at=now, attempts=F("attempts") + 1
+        )
+    return list(DocumentOCRJob.objects.filter(pk__in=ids, status=RUNNING, started_at=now))
+
+
+def complete(job, text):
+    now = timezone.now()
+    with transaction.atomic():
+        DocumentOCRJob.objects.filter(pk=job.pk).update(status=DONE, extracted_text=text, last_error="")
+        PropertyDocument.objects.filter(ocr_job=job, ai_extracted_text="").update(ai_extracted_text=text)
+        Property.objects.filter(documents__ocr_job=job).update(last_updated=now)
+    invalidate_tags("property")
+
+
+def release(job):
+    """
+    Requeue a claimed job without charging the attempt it was claimed with.
+    """
+    DocumentOCRJob.objects.filter(pk=job.pk, status=RUNNING).update(
+        status=PENDING, attempts=F("attempts") - 1, available_at=timezone.now()
+    )
+
+
+def fail(job, error):
+    if job.attempts >= MAX_ATTEMPTS:
+        DocumentOCRJob.objects.filter(pk=job.pk).update(status=FAILED, last_error=error)
+        logger.warning("OCR job %s failed after %d attempts: %s", job.pk, job.attempts, error)
+        return
+    delay = RETRY_DELAY_SECONDS * 2 ** (job.attempts - 1)
+    DocumentOCRJob.objects.filter(pk=job.pk).update(
+        status=PENDING, last_error=error, available_at=timezone.now() + timedelta(seconds=delay)
+    )
+
+
+@contextmanager
+def local_path(name):
+    """
+    Filesystem path of a stored file; remote storages are copied to a temp file.
+    """
+    try:
+        path = default_storage.path(name)
+    except NotImplementedError:
+        path = None
+    if path:
+        yield path
+        return
+    suffix = os.path.splitext(name)[1]
+    with default_storage.open(name, "rb") as source, tempfile.NamedTemporaryFile(suffix=suffix) as target:
+        shutil.copyfileobj(source, target)
+        target.flush()
+        yield target.name
+
+
+def process_batch(pool, jobs):
+    """
+    Run `jobs` on `pool`; returns (pool_died, requeued jobs). After a pool
+    process dies the pool is unusable and the other jobs of the batch are
+    requeued; a job that breaks the pool when it runs alone is charged the
+    attempt like any other failure.
+    """
+    pool_died = False
+    broken = []
+    with ExitStack() as stack:
+        futures = {}
+        for job in jobs:
+            try:
+                path = stack.enter_context(local_path(job.source_name))
+            except Exception as exc:
+                fail(job, repr(exc))
+                continue
+            try:
+                futures[pool.submit(ocr_document, path)] = job
+            except BrokenProcessPool:
+                pool_died = True
+                broken.append(job)
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                complete(job, future.result())
+            except BrokenProcessPool as exc:
+                pool_died = True
+                if len(jobs) == 1:
+                    fail(job, repr(exc))
+                else:
+                    broken.append(job)
+            except Exception as exc:
+                fail(job, repr(exc))
+    for job in broken:
+        release(job)
+    return pool_died, broken
+
+
+def run_worker(processes=None, batch_size=None, poll_interval=5.0, once=False):
+    """
+    Process queued jobs until interrupted (or, with `once`, until the queue
+    is empty). Returns the number of jobs processed.
+    """
+    processes = processes or os.cpu_count() or 1
+    batch_size = batch_size or processes * 2
+    processed = 0
+    suspects = set()  # jobs of a batch that broke the pool, rerun one at a time
+    pool = ProcessPoolExecutor(max_workers=processes)
+    try:
+        while True:
+            if suspects:
+                jobs = claim_jobs(1, among=suspects)
+                suspects.difference_update(job.pk for job in jobs)
+                if not jobs:
+                    # Taken by another worker or no longer pending
+                    suspects.clear()
+                    continue
+            else:
+                jobs = claim_jobs(batch_size)
+            if jobs:
+                pool_died, broken = process_batch(pool, jobs)
+                if pool_died:
+                    logger.warning("OCR pool process died; restarting it, %d jobs requeued to run one at a time", len(broken))
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = ProcessPoolExecutor(max_workers=processes)
+                    suspects.update(job.pk for job in broken)
+                processed += len(jobs) - len(broken)
+            elif once:
+                return processed
+            else:
+                time.sleep(poll_interval)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,112 @@
+"""
+Batch scoring of Property.ai_recommended_score.
+
+Scores come from ai_utils.recommendation_scores over each listing's
+wishlist count, visit requests (excluding cancelled ones), comparisons and
+age. They are stored on the row, stamped with `recommendation_scored_at`,
+so the ranked endpoints read them through an index instead of computing
+anything per request.
+
+`run()` is incremental: it only rescores listings that were never scored
+or gained engagement since the previous run. `run(full=True)` rescores
+every listing in primary-key chunks, which also refreshes the freshness
+term and picks up removed wishlist entries and cancelled visits; schedule
+it daily.
+"""
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+from ai_utils import recommendation_scores
+from booking.models import VisitRequest
+from crm_engagement.models import Wishlist, PropertyComparison
+from MBP.cache import invalidate_tags
+from .models import Property
+
+CHUNK_SIZE = 5000
+
+
+def _counts(queryset, field, property_ids):
+    rows = (
+        queryset.filter(**{f"{field}__in": property_ids})
+        .values(field)
+        .annotate(total=Count("id"))
+        .order_by()
+    )
+    return {row[field]: row["total"] for row in rows}
+
+
+def engagement_counts(property_ids):
+    """
+    {property_id: (wishlists, visits, comparisons)} for `property_ids`.
+    """
+    wishlists = _counts(Wishlist.objects.all(), "property_id", property_ids)
+    visits = _counts(VisitRequest.objects.exclude(status="Cancelled"), "property_id", property_ids)
+    first = _counts(PropertyComparison.objects.all(), "property_1_id", property_ids)
+    second = _counts(PropertyComparison.objects.all(), "property_2_id", property_ids)
+    return {
+        pk: (wishlists.get(pk, 0), visits.get(pk, 0), first.get(pk, 0) + second.get(pk, 0))
+        for pk in property_ids
+    }
+
+
+def score_properties(property_ids, now=None):
+    """
+    Recompute and store the scores of `property_ids`; returns how many changed.
+    """
+    now = now or timezone.now()
+    rows = list(Property.objects.filter(pk__in=property_ids).values_list("pk", "listed_on", "ai_recommended_score"))
+    if not rows:
+        return 0
+    counts = engagement_counts([pk for pk, _, _ in rows])
+    wishlists, visits, comparisons = zip(*(counts[pk] for pk, _, _ in rows))
+    ages = [(now - listed_on).total_seconds() / 86400 for _, listed_on, _ in rows]
+    scores = recommendation_scores(wishlists, visits, comparisons, ages)
+
+    changed, unchanged = [], []
+    for (pk, _, stored), score in zip(rows, scores):
+        score = float(score)
+        if score != stored:
+            # The score is part of the property responses; move their ETag along
+            changed.append(Property(pk=pk, ai_recommended_score=score, recommendation_scored_at=now, last_updated=now))
+        else:
+            unchanged.append(Property(pk=pk, recommendation_scored_at=now))
+
+    with transaction.atomic():
+        Property.objects.bulk_update(
+            changed, ["ai_recommended_score", "recommendation_scored_at", "last_updated"], batch_size=1000
+        )
+        Property.objects.bulk_update(unchanged, ["recommendation_scored_at"], batch_size=1000)
+    return len(changed)
+
+
+def stale_property_ids(since):
+    """
+    Listings never scored, or with wishlist, visit or comparison activity after `since`.
+    """
+    ids = set(Property.objects.filter(recommendation_scored_at__isnull=True).values_list("pk", flat=True))
+    if since is not None:
+        ids.update(Wishlist.objects.filter(added_at__gt=since).values_list("property_id", flat=True))
+        ids.update(VisitRequest.objects.filter(created_at__gt=since).values_list("property_id", flat=True))
+        for row in PropertyComparison.objects.filter(compared_at__gt=since).values_list("property_1_id", "property_2_id"):
+            ids.update(row)
+    return ids
+
+
+def run(full=False, chunk_size=CHUNK_SIZE):
+    """
+    Rescore stale listings (or all of them with `full`); returns
+    (listings scored, scores changed).
+    """
+    now = timezone.now()
+    if full:
+        ids = list(Property.objects.order_by("pk").values_list("pk", flat=True))
+    else:
+        since = Property.objects.aggregate(last_run=Max("recommendation_scored_at"))["last_run"]
+        ids = sorted(stale_property_ids(since))
+
+    changed = 0
+    for start in range(0, len(ids), chunk_size):
+        changed += score_properties(ids[start:start + chunk_size], now)
+    if changed:
+        invalidate_tags("property")
+    return len(ids), changed
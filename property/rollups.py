@@ -0,0 +1,95 @@
+"""
+Incremental maintenance of PropertyStatsRollup.
+
+Every Property contributes +1 listing, its price and area, and one price
+bucket to the rollup row of its (category, status, type, city) key. Saves
+move that contribution from the old key/values to the new ones; deletes
+remove it. Removing only ever updates an existing row, so a row already
+deleted (a PropertyType cascade) is not re-created. `rebuild()` recomputes the whole table in one grouped query.
+"""
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from .models import Property, PropertyStatsRollup
+
+PRICE_20_LAKH = 2000000
+PRICE_50_LAKH = 5000000
+
+TRACKED_FIELDS = ("category", "property_status", "property_type_id", "city", "price", "area_sqft")
+KEY_FIELDS = ("category", "property_status", "property_type_id", "city")
+
+
+def price_bucket(price):
+    if price < PRICE_20_LAKH:
+        return "price_below_20_lakh"
+    if price < PRICE_50_LAKH:
+        return "price_20_50_lakh"
+    return "price_above_50_lakh"
+
+
+def snapshot(instance):
+    return {field: getattr(instance, field) for field in TRACKED_FIELDS}
+
+
+def stored_snapshot(stored):
+    """
+    Tracked values out of a row's stored values, or None for new rows.
+    """
+    if stored is None:
+        return None
+    return {field: stored[field] for field in TRACKED_FIELDS}
+
+
+def _apply(values, sign):
+    key = {field: values[field] for field in KEY_FIELDS}
+    price = Decimal(values["price"] or 0)
+    area = float(values["area_sqft"] or 0)
+    bucket = price_bucket(price)
+
+    updated = PropertyStatsRollup.objects.filter(**key).update(
+        total_properties=F("total_properties") + sign,
+        price_sum=F("price_sum") + sign * price,
+        area_sum=F("area_sum") + sign * area,
+        **{bucket: F(bucket) + sign},
+    )
+    if updated or sign < 0:
+        return
+    try:
+        with transaction.atomic():
+            PropertyStatsRollup.objects.create(
+                **key, total_properties=1, price_sum=price, area_sum=area, **{bucket: 1}
+            )
+    except IntegrityError:
+        # Created concurrently
+        _apply(values, sign)
+
+
+def record_change(old_values, new_values):
+    if old_values == new_values:
+        return
+    with transaction.atomic():
+        if old_values is not None:
+            _apply(old_values, -1)
+        if new_values is not None:
+            _apply(new_values, 1)
+
+
+def rebuild():
+    rows = (
+        Property.objects.values(*KEY_FIELDS)
+        .annotate(
+            total_properties=Count("id"),
+            price_sum=Sum("price"),
+            area_sum=Sum("area_sqft"),
+            price_below_20_lakh=Count("id", filter=Q(price__lt=PRICE_20_LAKH)),
+            price_20_50_lakh=Count("id", filter=Q(price__gte=PRICE_20_LAKH, price__lt=PRICE_50_LAKH)),
+            price_above_50_lakh=Count("id", filter=Q(price__gte=PRICE_50_LAKH)),
+        )
+        .order_by()
+    )
+    with transaction.atomic():
+        PropertyStatsRollup.objects.all().delete()
+        PropertyStatsRollup.objects.bulk_create(
+            [PropertyStatsRollup(**row) for row in rows.iterator()], batch_size=500
+        )
+    return PropertyStatsRollup.objects.count()
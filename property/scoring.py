@@ -0,0 +1,100 @@
+"""
+Scoring engine for the AI fields of Property.
+
+`ai_price_estimate` depends only on the predictor's input fields
+(ai_utils.PRICE_FEATURES), so a save recomputes it only for new rows or
+when one of those fields changed; status flips and other unrelated writes
+keep the stored estimate. `ai_recommended_score` is assigned once, when
+the property is created.
+
+`rescore_all()` recomputes every estimate after a model rollout: rows are
+streamed in primary-key chunks, predicted with one vectorized call per
+chunk and written with bulk_update, without per-row saves or signals.
+"""
+from decimal import Decimal
+from django.db import transaction
+from django.utils import timezone
+from ai_utils import PRICE_FEATURES, predict_property_price, predict_property_prices, calculate_recommendation_score
+from MBP.cache import invalidate_tags
+from .models import Property
+
+AI_FIELDS = ("ai_price_estimate", "ai_recommended_score")
+CHUNK_SIZE = 5000
+
+
+def pricing_changed(instance, stored, update_fields=None):
+    """
+    True when a save of `instance` writes new values to any PRICE_FEATURES
+    field. `stored` holds the row's stored values (at least PRICE_FEATURES),
+    None for a new row.
+    """
+    if update_fields is not None:
+        written = {Property._meta.get_field(name).attname for name in update_fields}
+        if not written & set(PRICE_FEATURES):
+            return False
+    if stored is None:
+        return True
+    return any(stored[field] != getattr(instance, field) for field in PRICE_FEATURES)
+
+
+def refresh(instance, stored, update_fields=None):
+    """
+    Recompute the AI fields of `instance` in place when needed (pre_save).
+    Returns the names of the fields that were refreshed.
+    """
+    refreshed = []
+    if pricing_changed(instance, stored, update_fields):
+        instance.ai_price_estimate = predict_property_price(instance)
+        refreshed.append("ai_price_estimate")
+    if instance.ai_recommended_score is None:
+        instance.ai_recommended_score = calculate_recommendation_score(instance)
+        refreshed.append("ai_recommended_score")
+    return refreshed
+
+
+def persist(instance, refreshed, update_fields=None):
+    """
+    Write refreshed AI fields that an `update_fields` save left out (post_save).
+    """
+    if not update_fields:
+        return
+    missing = [field for field in refreshed if field not in update_fields]
+    if missing:
+        Property.objects.filter(pk=instance.pk).update(
+            **{field: getattr(instance, field) for field in missing}
+        )
+
+
+def _write_chunk(rows, now):
+    estimates = predict_property_prices([row[2:] for row in rows])
+    changed = []
+    for (pk, stored, *_), estimate in zip(rows, estimates):
+        estimate = Decimal(f"{estimate:.2f}")
+        if estimate != stored:
+            changed.append(Property(pk=pk, ai_price_estimate=estimate, last_updated=now))
+    Property.objects.bulk_update(changed, ["ai_price_estimate", "last_updated"], batch_size=1000)
+    return len(changed)
+
+
+def rescore_all(chunk_size=CHUNK_SIZE):
+    """
+    Recompute ai_price_estimate for every property; returns the number of
+    rows whose estimate changed.
+    """
+    now = timezone.now()
+    updated = 0
+    last_pk = 0
+    while True:
+        rows = list(
+            Property.objects.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .values_list("pk", "ai_price_estimate", *PRICE_FEATURES)[:chunk_size]
+        )
+        if not rows:
+            break
+        with transaction.atomic():
+            updated += _write_chunk(rows, now)
+        last_pk = rows[-1][0]
+    if updated:
+        invalidate_tags("property")
+    return updated
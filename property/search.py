@@ -0,0 +1,170 @@
+"""
+Inverted-index search over Property title, description, location and
+amenity names.
+
+SQLite uses an FTS5 virtual table keyed by the property id (bm25 ranking);
+PostgreSQL uses a weighted tsvector column with a GIN index (ts_rank).
+The index table lives outside the ORM and is created after `migrate` (or on
+first use); it is kept current by the receivers in property.signals and can
+be rebuilt with `python manage.py rebuild_search_index`. On any other backend
+`is_available()` is False and callers fall back to icontains filters.
+"""
+import re
+import threading
+from django.conf import settings
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+SEARCH_TABLE = "property_search"
+MAX_RESULTS = getattr(settings, "PROPERTY_SEARCH_MAX_RESULTS", 500)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_ready = set()
+_ready_lock = threading.Lock()
+
+
+def is_available():
+    return connection.vendor in ("sqlite", "postgresql")
+
+
+def ensure_index(conn=None):
+    conn = conn or connection
+    if conn.alias in _ready or conn.vendor not in ("sqlite", "postgresql"):
+        return
+    with _ready_lock:
+        if conn.alias in _ready:
+            return
+        with conn.cursor() as cursor:
+            if conn.vendor == "sqlite":
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+                    "title, description, location, amenities, tokenize='unicode61')"
+                )
+            else:
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+                    "property_id bigint PRIMARY KEY, document tsvector NOT NULL)"
+                )
+                cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_document_gin "
+                    f"ON {SEARCH_TABLE} USING GIN (document)"
+                )
+        _ready.add(conn.alias)
+
+
+def _document(property_instance, amenities=None):
+    if amenities is None:
+        amenities = property_instance.amenities.values_list("amenity", flat=True)
+    return (
+        property_instance.title or "",
+        property_instance.description or "",
+        property_instance.location or "",
+        " ".join(amenities),
+    )
+
+
+def index_property(property_instance, amenities=None):
+    """
+    Insert or replace the index row of one property. Pass `amenities`
+    (names) when already known to skip the amenity lookup.
+    """
+    if not is_available():
+        return
+    ensure_index()
+    title, description, location, amenity_text = _document(property_instance, amenities)
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [property_instance.pk])
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, title, description, location, amenities) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                [property_instance.pk, title, description, location, amenity_text],
+            )
+        else:
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} (property_id, document) VALUES (%s, "
+                "setweight(to_tsvector('simple', %s), 'A') || "
+                "setweight(to_tsvector('simple', %s), 'D') || "
+                "setweight(to_tsvector('simple', %s), 'C') || "
+                "setweight(to_tsvector('simple', %s), 'B')) "
+                "ON CONFLICT (property_id) DO UPDATE SET document = EXCLUDED.document",
+                [property_instance.pk, title, description, location, amenity_text],
+            )
+
+
+def remove_property(property_id):
+    if not is_available():
+        return
+    ensure_index()
+    key = "rowid" if connection.vendor == "sqlite" else "property_id"
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE {key} = %s", [property_id])
+
+
+def clear_index():
+    if not is_available():
+        return
+    ensure_index()
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+
+
+# Column restriction per backend: FTS5 column filter / tsvector weight label
+_LOCATION_ONLY = {"sqlite": "location : ", "postgresql": "C"}
+
+
+def _build_query(text, location_only=False):
+    terms = [t.lower() for t in _TOKEN_RE.findall(text or "")]
+    if not terms:
+        return None
+    if connection.vendor == "sqlite":
+        prefix = _LOCATION_ONLY["sqlite"] if location_only else ""
+        return " AND ".join(f'{prefix}"{term}"*' for term in terms)
+    weight = _LOCATION_ONLY["postgresql"] if location_only else ""
+    return " & ".join(f"{term}:*{weight}" for term in terms)
+
+
+def match_subquery(text, location_only=False):
+    """
+    Unranked `id IN (...)` subquery for use in ORM filters, or None when
+    full-text search is unavailable. Matches nothing for an empty query.
+    """
+    if not is_available():
+        return None
+    query = _build_query(text, location_only)
+    if query is None:
+        return RawSQL("SELECT NULL WHERE 1 = 0", [])
+    ensure_index()
+    if connection.vendor == "sqlite":
+        return RawSQL(f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s", [query])
+    return RawSQL(
+        f"SELECT property_id FROM {SEARCH_TABLE} WHERE document @@ to_tsquery('simple', %s)", [query]
+    )
+
+
+def search_ids(text, location_only=False, limit=None):
+    """
+    Returns property ids matching every term of `text` (prefix matching),
+    best match first, or None when full-text search is unavailable.
+    """
+    if not is_available():
+        return None
+    query = _build_query(text, location_only)
+    if query is None:
+        return []
+    ensure_index()
+    limit = limit or MAX_RESULTS
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(
+                f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s "
+                f"ORDER BY bm25({SEARCH_TABLE}, 10.0, 1.0, 5.0, 3.0) LIMIT %s",
+                [query, limit],
+            )
+        else:
+            cursor.execute(
+                f"SELECT property_id FROM {SEARCH_TABLE}, to_tsquery('simple', %s) query "
+                "WHERE document @@ query ORDER BY ts_rank(document, query) DESC LIMIT %s",
+                [query, limit],
+            )
+        return [row[0] for row in cursor.fetchall()]
@@ -1,14 +1,41 @@
 from rest_framework import serializers
 from .models import (
     PropertyType, Address, Property, PropertyImage, PropertyVideo,
-    PropertyAmenity, PropertyDocument, PostedProperty, PropertyContact as Contact
+    PropertyAmenity, PropertyDocument, PostedProperty, MediaUpload, PropertyContact as Contact
 )
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from MBP.cache import invalidate_tags
+from MBP.utils import log_bulk_create
+from . import images as property_images, ocr, search, uploads
 
 
 User = get_user_model()
 
 
+def _storage_url(name, request):
+    url = default_storage.url(name)
+    return request.build_absolute_uri(url) if request else url
+
+
+def derivative_urls(derivatives, request=None):
+    """
+    URLs of the files recorded in PropertyImage.derivatives, keyed by size label.
+    """
+    return {
+        label: {
+            "width": entry["width"],
+            "height": entry["height"],
+            "src": _storage_url(entry["src"], request),
+            "webp": _storage_url(entry["webp"], request),
+        }
+        for label, entry in (derivatives or {}).items()
+        if label != "source"
+    }
+
+
 class PropertyContactSerializer(serializers.ModelSerializer):
     class Meta:
         model = Contact
@@ -56,6 +83,8 @@ class PropertyImageSerializer(serializers.ModelSerializer):
         source="property",
         write_only=True,
     )
+    # resized JPEG/PNG + WebP URLs per size, e.g. {"thumb": {"width": 320, "src": ..., "webp": ...}}
+    variants = serializers.SerializerMethodField()
 
     class Meta:
         model = PropertyImage
@@ -64,6 +93,7 @@ class PropertyImageSerializer(serializers.ModelSerializer):
             "property",       # read-only (slug shown)
             "property_slug",  # write-only input
             "image",
+            "variants",
             "caption",
             "is_primary",
             "uploaded_at",
@@ -72,6 +102,9 @@ class PropertyImageSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["id", "uploaded_at", "slug", "property"]
 
+    def get_variants(self, obj):
+        return derivative_urls(obj.derivatives, self.context.get("request"))
+
     def create(self, validated_data):
         # validated_data will already contain 'property' (the instance) because of SlugRelatedField
         return super().create(validated_data)
@@ -115,6 +148,7 @@ class PropertyDocumentSerializer(serializers.ModelSerializer):
         write_only=True,
     )
     document_file = serializers.FileField()
+    ocr_status = serializers.CharField(source="ocr_job.status", read_only=True, default=None)
 
     class Meta:
         model = PropertyDocument
@@ -128,6 +162,7 @@ class PropertyDocumentSerializer(serializers.ModelSerializer):
             "verified_by",
             "verified_at",
             "ai_extracted_text",
+            "ocr_status",
             "slug",
         ]
         read_only_fields = ["id", "slug", "verified_at", "ai_extracted_text", "property"]
@@ -225,49 +260,106 @@ class PropertySerializer(serializers.ModelSerializer):
             else "Pending"
         )
 
-        # Create property instance
-        property_instance = Property.objects.create(**validated_data)
-
-        # Save amenities
-        for amenity in amenities:
-            PropertyAmenity.objects.create(property=property_instance, amenity=amenity)
-
-        # Save images
-        for i, img in enumerate(images):
-            PropertyImage.objects.create(
-                property=property_instance,
-                image=img,
-                caption=captions[i] if i < len(captions) else "",
-            )
-
-        # Save documents
-        for i, doc in enumerate(documents):
-            PropertyDocument.objects.create(
-                property=property_instance,
-                document_file=doc,
-                document_type=doc_types[i] if i < len(doc_types) else "Other",
-            )
-        
-        if owner_name or email or phone:
-            Contact.objects.create(
-                property=property_instance,
-                owner_name=owner_name or "",
-                email=email or "",
-                phone_number=phone or "",
-            )
-            
-        # Save videos
-        for i, video in enumerate(videos):
-            PropertyVideo.objects.create(
-                property=property_instance,
-                video=video,
-                caption=video_captions[i] if i < len(video_captions) else ""
-            )
-
-        # 🔑 Reload with related objects so they appear in response
-        return Property.objects.prefetch_related("amenities", "images", "documents").get(
-            id=property_instance.id
+        with transaction.atomic():
+            # Create property instance
+            property_instance = Property.objects.create(**validated_data)
+
+            # Children are inserted with one bulk_create per model; bulk_create
+            # skips save() and post_save, so slugs are set here and the per-row
+            # side effects (audit, search index, OCR, image processing) below.
+            amenity_rows = [
+                PropertyAmenity(property=property_instance, amenity=amenity)
+                for amenity in amenities
+            ]
+            image_rows = [
+                PropertyImage(
+                    property=property_instance,
+                    image=img,
+                    caption=captions[i] if i < len(captions) else "",
+                )
+                for i, img in enumerate(images)
+            ]
+            document_rows = [
+                PropertyDocument(
+                    property=property_instance,
+                    document_file=doc,
+                    document_type=doc_types[i] if i < len(doc_types) else "Other",
+                )
+                for i, doc in enumerate(documents)
+            ]
+            video_rows = [
+                PropertyVideo(
+                    property=property_instance,
+                    video=video,
+                    caption=video_captions[i] if i < len(video_captions) else ""
+                )
+                for i, video in enumerate(videos)
+            ]
+            ocr.attach_jobs(document_rows)
+
+            created = []
+            for model, rows in (
+                (PropertyAmenity, amenity_rows),
+                (PropertyImage, image_rows),
+                (PropertyDocument, document_rows),
+                (PropertyVideo, video_rows),
+            ):
+                for row in rows:
+                    row.set_slug()
+                if rows:
+                    created += model.objects.bulk_create(rows)
+
+            if owner_name or email or phone:
+                Contact.objects.create(
+                    property=property_instance,
+                    owner_name=owner_name or "",
+                    email=email or "",
+                    phone_number=phone or "",
+                )
+
+            ocr.record_sources(document_rows)
+            if amenity_rows:
+                search.index_property(property_instance, amenities=amenities)
+            log_bulk_create(created)
+
+        # Image resizing and tagging run on the property.images pool
+        for image in image_rows:
+            property_images.schedule(image)
+        invalidate_tags("property")
+
+        # 🔑 Load related objects so they appear in response
+        prefetch_related_objects(
+            [property_instance], "amenities", "images", "documents__ocr_job", "videos", "contacts"
         )
+        return property_instance
+
+class PropertyCardSerializer(serializers.ModelSerializer):
+    """
+    Compact read-only representation for listing cards and home-page widgets.
+    Expects the queryset to be annotated with `primary_image` and
+    `primary_image_derivatives` (see property.views.with_card_columns).
+    """
+    property_type = serializers.CharField(source="property_type.name", read_only=True)
+    primary_image = serializers.SerializerMethodField()
+    primary_image_variants = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Property
+        fields = [
+            "id", "slug", "title", "category", "property_type", "property_status",
+            "location", "price", "price_per_sqft", "area_sqft", "bedrooms", "bathrooms",
+            "ai_recommended_score", "listed_on", "primary_image", "primary_image_variants",
+        ]
+        read_only_fields = fields
+
+    def get_primary_image(self, obj):
+        name = getattr(obj, "primary_image", None)
+        if not name:
+            return None
+        return _storage_url(name, self.context.get("request"))
+
+    def get_primary_image_variants(self, obj):
+        return derivative_urls(getattr(obj, "primary_image_derivatives", None), self.context.get("request"))
 
 # ---------------- PostedProperty ---------------- #
 class PostedPropertySerializer(serializers.ModelSerializer):
@@ -275,4 +367,43 @@ class PostedPropertySerializer(serializers.ModelSerializer):
         model = PostedProperty
         fields = "__all__"
         read_only_fields = ["id", "posted_on", "slug"]
-        
\ No newline at end of file
+        
+
+# ---------------- MediaUpload ---------------- #
+class MediaUploadSerializer(serializers.ModelSerializer):
+    property = serializers.SlugRelatedField(read_only=True, slug_field="slug")
+    property_slug = serializers.SlugRelatedField(
+        queryset=Property.objects.all(),
+        slug_field="slug",
+        source="property",
+        write_only=True,
+    )
+    # the PropertyImage / PropertyVideo, once the last chunk has arrived
+    attachment = serializers.SerializerMethodField()
+
+    class Meta:
+        model = MediaUpload
+        fields = [
+            "id", "property", "property_slug", "kind", "filename", "caption",
+            "size", "offset", "status", "attachment", "created_at", "updated_at",
+        ]
+        read_only_fields = ["id", "offset", "status", "created_at", "updated_at"]
+
+    def validate_size(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Size must be positive.")
+        if value > uploads.MAX_SIZE:
+            raise serializers.ValidationError(f"Uploads are limited to {uploads.MAX_SIZE} bytes.")
+        return value
+
+    def get_attachment(self, obj):
+        attachment = uploads.get_attachment(obj)
+        if attachment is None:
+            return None
+        serializer_class = PropertyImageSerializer if obj.kind == "image" else PropertyVideoSerializer
+        return serializer_class(attachment, context=self.context).data
+
+    def create(self, validated_data):
+        upload = super().create(validated_data)
+        uploads.start(upload)
+        return upload
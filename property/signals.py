@@ -1,36 +1,127 @@
-from django.db.models.signals import pre_save
+from django.db import connections, transaction
+from django.db.models import QuerySet
+from django.db.models.signals import pre_save, post_save, post_delete, post_migrate
 from django.dispatch import receiver
-from .models import Property
-from ai_utils import predict_property_price, calculate_recommendation_score
+from django.utils import timezone
+from .models import Property, PropertyAmenity, PropertyImage, PropertyVideo, PropertyDocument, PropertyContact
+from . import search, rollups, scoring, images
+from MBP.cache import invalidate_tags
+
+# Stored columns compared against by the AI refresh and the rollups
+STORED_PROPERTY_FIELDS = tuple(dict.fromkeys(scoring.PRICE_FEATURES + rollups.TRACKED_FIELDS))
+
+
+@receiver(pre_save, sender=Property)
+def load_stored_property_values(sender, instance, update_fields=None, **kwargs):
+    # One SELECT of the stored row per save, shared by the receivers below;
+    # None for new rows and for saves that write none of these columns
+    instance._stored_values = None
+    if instance._state.adding:
+        return
+    if update_fields:
+        written = {sender._meta.get_field(name).attname for name in update_fields}
+        if not written & set(STORED_PROPERTY_FIELDS):
+            return
+    instance._stored_values = Property.objects.filter(pk=instance.pk).values(*STORED_PROPERTY_FIELDS).first()
+
 
 @receiver(pre_save, sender=Property)
-def update_property_ai_fields(sender, instance, **kwargs):
-    # Only update if needed, for example when the price or features change
-    instance.ai_price_estimate = predict_property_price(instance)
-    instance.ai_recommended_score = calculate_recommendation_score(instance)
+def update_property_ai_fields(sender, instance, update_fields=None, **kwargs):
+    # Only recomputed for new rows or when the predictor's input fields change
+    instance._ai_refreshed = scoring.refresh(instance, instance._stored_values, update_fields)
+
+
+@receiver(post_save, sender=Property)
+def persist_property_ai_fields(sender, instance, update_fields=None, **kwargs):
+    scoring.persist(instance, getattr(instance, "_ai_refreshed", ()), update_fields)
 
 from .models import PropertyImage
-from ai_utils import classify_property_image
 
-@receiver(pre_save, sender=PropertyImage)
-def update_propertyimage_ai_tag(sender, instance, **kwargs):
-    # Assuming instance.image.path contains the file path
-    if instance.image and not instance.ai_tag:
-        try:
-            instance.ai_tag = classify_property_image(instance.image.path)
-        except Exception:
-            instance.ai_tag = ""
+@receiver(post_save, sender=PropertyImage)
+def queue_image_derivatives(sender, instance, **kwargs):
+    # Resizing and ai_tag classification run on the property.images pool
+    images.schedule(instance)
+
+
+@receiver(post_delete, sender=PropertyImage)
+def remove_image_derivatives(sender, instance, **kwargs):
+    transaction.on_commit(lambda: images.remove(instance.derivatives))
 
 from .models import PropertyDocument
-from ai_utils import extract_text_from_document
+from . import ocr
 
 @receiver(pre_save, sender=PropertyDocument)
 def update_document_ai_text(sender, instance, **kwargs):
-    if instance.document_file and not instance.ai_extracted_text:
-        try:
-            instance.ai_extracted_text = extract_text_from_document(instance.document_file.path)
-        except Exception:
-            instance.ai_extracted_text = ""
+    # OCR runs in the run_ocr_worker process pool; the save only queues it
+    ocr.attach_job(instance)
+
+
+@receiver(post_save, sender=PropertyDocument)
+def record_document_ocr_source(sender, instance, **kwargs):
+    ocr.record_source(instance)
+
+@receiver(post_migrate)
+def create_property_search_index(sender, using, **kwargs):
+    if sender.name == "property":
+        search.ensure_index(connections[using])
+
+
+@receiver(post_save, sender=Property)
+def index_property_for_search(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not {"title", "description", "location"} & set(update_fields):
+        return
+    search.index_property(instance)
+
+
+@receiver(post_delete, sender=Property)
+def remove_property_from_search(sender, instance, **kwargs):
+    search.remove_property(instance.pk)
+
+
+@receiver(pre_save, sender=Property)
+def capture_property_rollup_values(sender, instance, update_fields=None, **kwargs):
+    instance._rollup_previous = instance._rollup_current = None
+    written = None
+    if update_fields:
+        written = {sender._meta.get_field(name).attname for name in update_fields}
+        if not written & set(rollups.TRACKED_FIELDS):
+            return
+
+    previous = rollups.stored_snapshot(instance._stored_values)
+    current = rollups.snapshot(instance)
+    if written and previous is not None:
+        # Only the listed columns are written; the rest keep their stored values.
+        current = {
+            field: current[field] if field in written else previous[field]
+            for field in rollups.TRACKED_FIELDS
+        }
+    instance._rollup_previous, instance._rollup_current = previous, current
+
+
+@receiver(post_save, sender=Property)
+def update_property_rollup(sender, instance, **kwargs):
+    previous = getattr(instance, "_rollup_previous", None)
+    current = getattr(instance, "_rollup_current", None)
+    if current is not None:
+        rollups.record_change(previous, current)
+
+
+@receiver(post_delete, sender=Property)
+def remove_property_from_rollup(sender, instance, **kwargs):
+    rollups.record_change(rollups.snapshot(instance), None)
+
+
+@receiver(post_save, sender=PropertyAmenity)
+@receiver(post_delete, sender=PropertyAmenity)
+def reindex_property_amenities(sender, instance, origin=None, **kwargs):
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin is not None and origin_model is not PropertyAmenity:
+        # Cascade from deleting the property (or its type / owner); its index row goes with it
+        return
+    try:
+        search.index_property(instance.property)
+    except Property.DoesNotExist:
+        pass
 
 # signals.py
 from django.db.models.signals import post_save
@@ -50,6 +141,38 @@ def update_agent_deals(sender, instance, **kwargs):
                 agent=instance.agent, property_status__in=["Sold", "Rented"]
             ).count()
             agent_profile.deals_closed = closed_deals
-            agent_profile.save(update_fields=["deals_closed"])
+            agent_profile.save(update_fields=["deals_closed", "updated_at"])
         except AgentProfile.DoesNotExist:
             pass
+
+
+@receiver(post_save, sender=PropertyImage)
+@receiver(post_delete, sender=PropertyImage)
+@receiver(post_save, sender=PropertyVideo)
+@receiver(post_delete, sender=PropertyVideo)
+@receiver(post_save, sender=PropertyAmenity)
+@receiver(post_delete, sender=PropertyAmenity)
+@receiver(post_save, sender=PropertyDocument)
+@receiver(post_delete, sender=PropertyDocument)
+@receiver(post_save, sender=PropertyContact)
+@receiver(post_delete, sender=PropertyContact)
+def touch_parent_property(sender, instance, **kwargs):
+    # Nested rows are part of the property detail response; advance the
+    # parent's last_updated so its ETag / Last-Modified change with them.
+    Property.objects.filter(pk=instance.property_id).update(last_updated=timezone.now())
+
+
+@receiver(post_save, sender=Property)
+@receiver(post_delete, sender=Property)
+@receiver(post_save, sender=PropertyImage)
+@receiver(post_delete, sender=PropertyImage)
+@receiver(post_save, sender=PropertyVideo)
+@receiver(post_delete, sender=PropertyVideo)
+@receiver(post_save, sender=PropertyAmenity)
+@receiver(post_delete, sender=PropertyAmenity)
+@receiver(post_save, sender=PropertyDocument)
+@receiver(post_delete, sender=PropertyDocument)
+@receiver(post_save, sender=PropertyContact)
+@receiver(post_delete, sender=PropertyContact)
+def invalidate_property_responses(sender, **kwargs):
+    invalidate_tags("property")
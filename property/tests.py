@@ -1,3 +1,405 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from accounts.models import User
+import numpy as np
+import price_model
+from MBP.audit import audit_user
+from MBP.models import AuditLog, StoredBlob
+from MBP.utils import log_bulk_create
+from MBP.permissions import HasModelPermission
+from MBP.storage import blob_name
+from . import search, uploads
+from .models import (
+    Property, PropertyType, PropertyImage, PropertyVideo, PropertyAmenity, PropertyDocument, PropertyContact,
+    MediaUpload, PropertyStatsRollup,
+)
 
-# Create your tests here.
+
+def make_property(owner, **fields):
+    property_type = PropertyType.objects.get_or_create(name="Apartment")[0]
+    data = dict(
+        title="Flat", description="2BHK", property_type=property_type, category="Sale", owner=owner,
+        location="12, MG Road, Near Metro, Kothrud, Pune", latitude=Decimal("18.5"), longitude=Decimal("73.8"),
+        area_sqft=1000, price=Decimal("3000000"), price_per_sqft=Decimal("3000"), bedrooms=2, bathrooms=2,
+        balconies=1, furnishing="Furnished", floor_no=1, total_floors=5, availability_status="Ready to Move",
+        possession_date=timezone.now().date(), age_of_property="1", ownership_type="Freehold",
+        maintenance_cost=Decimal("100"), property_status="Active",
+    )
+    data.update(fields)
+    return Property.objects.create(**data)
+
+
+class NearbyTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.owner = User.objects.create_user(email="owner@example.com", password="pw")
+        make_property(self.owner)
+
+    def test_radius_search(self):
+        response = self.client.get("/api/properties/nearby/", {"lat": "18.5", "lng": "73.8", "radius_km": "2"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+
+    def test_rejects_non_finite_and_out_of_range_input(self):
+        for params in (
+            {"bbox": "nan,0,1,1"},
+            {"bbox": "0,0,inf,1"},
+            {"lat": "nan", "lng": "73.8"},
+            {"lat": "18.5", "lng": "73.8", "radius_km": "inf"},
+            {"lat": "18.5", "lng": "73.8", "radius_km": "-1"},
+            {"lat": "91", "lng": "73.8"},
+            {"lat": "18.5", "lng": "-181"},
+            {"bbox": "19,72,18,73"},
+        ):
+            response = self.client.get("/api/properties/nearby/", params)
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_limit_is_at_least_one(self):
+        response = self.client.get("/api/properties/nearby/", {"bbox": "18,73,19,74", "limit": "-5"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+
+
+class DerivedLocationFieldTests(TestCase):
+    def test_partial_saves_write_city_and_geohash(self):
+        prop = make_property(User.objects.create_user(email="owner@example.com", password="pw"))
+        prop.location = "4, Marine Drive, Churchgate, Mumbai"
+        prop.save(update_fields=["location"])
+        prop.latitude, prop.longitude = Decimal("18.94"), Decimal("72.82")
+        prop.save(update_fields=["latitude", "longitude"])
+        stored = Property.objects.get(pk=prop.pk)
+        self.assertEqual(stored.city, "Mumbai")
+        self.assertEqual(stored.geohash, prop.geohash)
+        response = APIClient().get("/api/properties/nearby/", {"lat": "18.94", "lng": "72.82", "radius_km": "1"})
+        self.assertEqual([row["slug"] for row in response.data], [prop.slug])
+
+
+class ListingQueryPlanTests(TestCase):
+    """
+    Listing and detail responses nest five relations; their query count must
+    not grow with the number of properties or children.
+    """
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email="admin@example.com", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def make_listing(self, index):
+        prop = make_property(self.admin, title=f"Flat {index}")
+        for child in range(2):
+            PropertyImage.objects.create(property=prop, image=f"property_images/{index}-{child}.jpg")
+            PropertyVideo.objects.create(property=prop, video=f"property_videos/{index}-{child}.mp4")
+            PropertyAmenity.objects.create(property=prop, amenity=f"Gym {index}-{child}")
+            # An already content-addressed name, so saving it does not read the file
+            PropertyDocument.objects.create(
+                property=prop, document_type="Brochure", document_file=blob_name(f"{index:02d}{child:062d}", ".pdf")
+            )
+            PropertyContact.objects.create(
+                property=prop, owner_name=f"Owner {index}-{child}", email="owner@example.com", phone_number="1"
+            )
+        return prop
+
+    def list_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/properties/", {"page_size": 50})
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_list_query_count_is_constant(self):
+        self.make_listing(0)
+        one, _ = self.list_queries()
+        for index in range(1, 6):
+            self.make_listing(index)
+        many, response = self.list_queries()
+        self.assertEqual(len(response.data["results"]), 6)
+        self.assertEqual(len(response.data["results"][0]["images"]), 2)
+        self.assertEqual(one, many)
+        # version probe, page, then one query per nested relation
+        self.assertEqual(many, 7)
+
+    def test_detail_query_count(self):
+        prop = self.make_listing(0)
+        with self.assertNumQueries(7):
+            # version probe, row, then one query per nested relation
+            response = self.client.get(f"/api/properties/{prop.slug}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["contacts"]), 2)
+
+
+class CardActionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(email="owner@example.com", password="pw")
+        for index in range(4):
+            prop = make_property(self.owner, title=f"Flat {index}", property_status="Active")
+            PropertyImage.objects.create(property=prop, image=f"property_images/{index}.jpg", is_primary=True)
+            PropertyAmenity.objects.create(property=prop, amenity="Gym")
+
+    def test_widget_answers_cards_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = APIClient().get("/api/properties/ai-properties/", {"limit": 10})
+        self.assertEqual(len(response.data), 4)
+        self.assertNotIn("images", response.data[0])
+        self.assertTrue(response.data[0]["primary_image"].endswith(".jpg"))
+
+
+class VerificationRateTests(TestCase):
+    def test_one_aggregate_query(self):
+        admin = User.objects.create_superuser(email="admin@example.com", password="pw")
+        client = APIClient()
+        client.force_authenticate(admin)
+        prop = make_property(admin)
+        for index, verified in enumerate((True, False, False, True)):
+            PropertyDocument.objects.create(
+                property=prop, document_type="Deed", verified=verified,
+                document_file=blob_name(f"{index:064d}", ".pdf"),
+            )
+        with self.assertNumQueries(1):
+            response = client.get("/api/property-documents/verification-rate/")
+        self.assertEqual(response.data, {"total_documents": 4, "verified": 2, "verification_rate_percent": 50.0})
+
+
+class MediaUploadFailureTests(TestCase):
+    """
+    Racing or failing chunks: the staging file only takes the winning
+    chunk, and an upload whose completion fails ends up failed, without a
+    staging file or a stored file left behind.
+    """
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        patcher = mock.patch.object(uploads, "STAGING_DIR", os.path.join(media_root.name, "staging"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.owner = User.objects.create_superuser(email="admin@example.com", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.prop = make_property(self.owner)
+
+    def upload(self, kind, data):
+        response = self.client.post(
+            "/api/media-uploads/",
+            {"property_slug": self.prop.slug, "kind": kind, "filename": f"file.{kind}", "size": len(data)},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        upload_id = response.data["id"]
+        response = self.client.put(
+            f"/api/media-uploads/{upload_id}/chunk/", data, content_type="application/octet-stream",
+            HTTP_UPLOAD_OFFSET="0",
+        )
+        return MediaUpload.objects.get(pk=upload_id), response
+
+    def test_losing_chunk_does_not_touch_the_staging_file(self):
+        response = self.client.post(
+            "/api/media-uploads/",
+            {"property_slug": self.prop.slug, "kind": "video", "filename": "tour.mp4", "size": 10},
+            format="json",
+        )
+        winner, loser = MediaUpload.objects.get(pk=response.data["id"]), MediaUpload.objects.get(pk=response.data["id"])
+        uploads.append(winner, io.BytesIO(b"aaaaa"), 0, 5)
+        with self.assertRaises(uploads.OffsetMismatch) as raised:
+            uploads.append(loser, io.BytesIO(b"bbbbb"), 0, 5)
+        self.assertEqual(raised.exception.offset, 5)
+        with open(uploads.staging_path(winner), "rb") as fh:
+            self.assertEqual(fh.read(), b"aaaaa")
+
+    def test_invalid_image_fails_the_upload(self):
+        upload, response = self.upload("image", b"not an image")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(upload.status, uploads.FAILED)
+        self.assertFalse(os.path.exists(uploads.staging_path(upload)))
+        response = self.client.put(
+            f"/api/media-uploads/{upload.pk}/chunk/", b"", content_type="application/octet-stream",
+            HTTP_UPLOAD_OFFSET=str(upload.offset),
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_failed_attachment_save_releases_the_stored_file(self):
+        with mock.patch.object(PropertyVideo, "save", side_effect=RuntimeError("database is down")):
+            with self.assertRaises(RuntimeError):
+                self.upload("video", b"video bytes")
+        upload = MediaUpload.objects.get()
+        self.assertEqual(upload.status, uploads.FAILED)
+        self.assertFalse(os.path.exists(uploads.staging_path(upload)))
+        self.assertFalse(StoredBlob.objects.exists())
+        self.assertFalse(PropertyVideo.objects.exists())
+
+
+class RollupMaintenanceTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(email="owner@example.com", password="pw")
+
+    def test_property_type_cascade_does_not_recreate_rollups(self):
+        villa = PropertyType.objects.create(name="Villa")
+        make_property(self.owner, property_type=villa)
+        make_property(self.owner, property_type=villa, price=Decimal("6000000"))
+        self.assertEqual(PropertyStatsRollup.objects.get(property_type=villa).total_properties, 2)
+        villa.delete()
+        self.assertFalse(PropertyStatsRollup.objects.exists())
+        self.assertFalse(Property.objects.exists())
+
+    def test_price_change_reads_the_stored_row_once(self):
+        prop = make_property(self.owner)
+        prop.price = Decimal("6000000")
+        with CaptureQueriesContext(connection) as ctx:
+            prop.save(update_fields=["price"])
+        selects = [query["sql"] for query in ctx.captured_queries if query["sql"].startswith("SELECT")]
+        self.assertEqual(len(selects), 1)
+        # old key decremented, new bucket incremented, both in place
+        rollup_writes = [query["sql"] for query in ctx.captured_queries if "property_propertystatsrollup" in query["sql"]]
+        self.assertEqual(len(rollup_writes), 2)
+        rollup = PropertyStatsRollup.objects.get()
+        self.assertEqual((rollup.total_properties, rollup.price_20_50_lakh, rollup.price_above_50_lakh), (1, 0, 1))
+
+
+class CachedResponseInvalidationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.prop = make_property(User.objects.create_user(email="owner@example.com", password="pw"))
+
+    def test_child_rows_expire_cached_property_responses(self):
+        url = "/api/properties/ai-properties/"
+        self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+        self.assertEqual(self.client.get(url)["X-Cache"], "HIT")
+        amenity = PropertyAmenity.objects.create(property=self.prop, amenity="Gym")
+        self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+        self.assertEqual(self.client.get(url)["X-Cache"], "HIT")
+        amenity.delete()
+        self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+        PropertyContact.objects.create(property=self.prop, owner_name="Owner", email="o@example.com", phone_number="1")
+        self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email="admin@example.com", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.first = make_property(self.admin, title="First")
+        self.second = make_property(self.admin, title="Second")
+
+    def test_list_revalidates_on_the_etag_only(self):
+        response = self.client.get("/api/properties/")
+        self.assertNotIn("Last-Modified", response)
+        etag = response["ETag"]
+        self.assertEqual(self.client.get("/api/properties/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Deleting the older row leaves the newest timestamp as it was
+        self.first.delete()
+        self.assertEqual(self.client.get("/api/properties/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(
+            self.client.get("/api/properties/", HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT").status_code,
+            200,
+        )
+
+    def test_detail_304_checks_object_permissions(self):
+        url = f"/api/properties/{self.second.slug}/"
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with mock.patch.object(HasModelPermission, "has_object_permission", return_value=False, create=True):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 403)
+
+
+class PriceModelArtifactTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def make_model(self, cities):
+        vocabularies = {"furnishing": ["Furnished"], "city": cities}
+        width = 1 + len(price_model.NUMERIC_FEATURES) + 1 + len(cities)
+        return price_model.PriceModel(np.zeros(width), vocabularies, {"cities": len(cities)})
+
+    def test_saves_switch_versions_atomically(self):
+        with override_settings(PRICE_MODEL_DIR=self.directory):
+            first = self.make_model(["Pune"]).save(self.directory)
+            self.assertEqual(price_model.get_model().vocabularies["city"], ["Pune"])
+            self.make_model(["Mumbai", "Pune"]).save(self.directory)
+            model = price_model.get_model()
+            self.assertEqual(model.vocabularies["city"], ["Mumbai", "Pune"])
+            self.assertEqual(len(model.coef), 8)
+            # The earlier version stays untouched for readers still loading it
+            self.assertTrue(os.path.isdir(os.path.join(self.directory, price_model.VERSIONS_DIR, first)))
+            for _ in range(3):
+                self.make_model(["Delhi"]).save(self.directory)
+            versions = os.listdir(os.path.join(self.directory, price_model.VERSIONS_DIR))
+            self.assertEqual(len(versions), price_model.KEEP_VERSIONS + 1)
+            self.assertNotIn(first, versions)
+
+    def test_loads_unversioned_artifacts(self):
+        self.make_model(["Pune"]).save(self.directory)
+        version_dir = price_model.artifact_dir(self.directory)
+        legacy = os.path.join(self.directory, "legacy")
+        shutil.copytree(version_dir, legacy)
+        self.assertEqual(price_model.PriceModel.load(legacy).vocabularies["city"], ["Pune"])
+
+
+@override_settings(AUDIT_LOG_ASYNC=False)
+class ListingAuditTests(TestCase):
+    def test_videos_and_contacts_are_audited(self):
+        owner = User.objects.create_user(email="owner@example.com", password="pw")
+        prop = make_property(owner)
+        with audit_user(owner):
+            video = PropertyVideo(property=prop, video="property_videos/tour.mp4")
+            video.set_slug()
+            log_bulk_create(PropertyVideo.objects.bulk_create([video]))
+            contact = PropertyContact.objects.create(
+                property=prop, owner_name="Owner", email="owner@example.com", phone_number="1"
+            )
+            contact.phone_number = "2"
+            contact.save()
+            video.delete()
+        self.assertEqual(
+            sorted(AuditLog.objects.values_list("model_name", "action")),
+            [
+                ("PropertyContact", "create"), ("PropertyContact", "update"),
+                ("PropertyVideo", "create"), ("PropertyVideo", "delete"),
+            ],
+        )
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        if not search.is_available():
+            self.skipTest("Full-text search needs SQLite or PostgreSQL")
+        self.owner = User.objects.create_user(email="owner@example.com", password="pw")
+        self.prop = make_property(self.owner, title="Sea view penthouse", description="Top floor")
+        make_property(self.owner, title="Garden cottage", description="Quiet lane")
+
+    def test_indexed_on_save_and_ranked_by_query(self):
+        self.assertEqual(search.search_ids("sea"), [self.prop.pk])
+        self.assertEqual(search.search_ids("pent"), [self.prop.pk])
+        response = APIClient().get("/api/properties/search/", {"q": "sea view"})
+        self.assertEqual([row["slug"] for row in response.data], [self.prop.slug])
+
+    def test_amenity_changes_reindex_the_property(self):
+        amenity = PropertyAmenity.objects.create(property=self.prop, amenity="Jacuzzi")
+        self.assertEqual(search.search_ids("jacuzzi"), [self.prop.pk])
+        amenity.delete()
+        self.assertEqual(search.search_ids("jacuzzi"), [])
+
+    def test_property_delete_does_not_reindex_per_amenity(self):
+        for name in ("Gym", "Pool", "Lift"):
+            PropertyAmenity.objects.create(property=self.prop, amenity=name)
+        with mock.patch.object(search, "index_property") as index_property:
+            self.prop.delete()
+        index_property.assert_not_called()
+        self.assertEqual(search.search_ids("sea"), [])
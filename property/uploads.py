@@ -0,0 +1,191 @@
+"""
+Resumable, chunked uploads of property images and videos.
+
+A client declares the file (`POST /api/media-uploads/`), then sends it in
+pieces with `PUT /api/media-uploads/{id}/chunk/` and a
+`Content-Range: bytes <start>-<end>/<size>` header (or tus-style
+`Upload-Offset: <start>`). Each chunk is streamed from the request body
+straight into the staging file at its offset, so no request holds more
+than one chunk and nothing is buffered in memory or copied to a temp file
+first. After an interrupted chunk, `GET /api/media-uploads/{id}/` returns
+the offset to resume from.
+
+Once the last byte arrives the staging file is handed to the storage as an
+already-on-disk file, which FileSystemStorage moves into MEDIA_ROOT with a
+rename (keep MEDIA_UPLOAD_STAGING_DIR on the same filesystem), and the
+PropertyImage / PropertyVideo is created. If that fails (not a valid
+image, storage or database error) the upload is marked failed and its
+staging file removed; the client starts a new upload. `python manage.py
+purge_media_uploads` removes abandoned uploads.
+"""
+import os
+import tempfile
+from datetime import timedelta
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+from .models import MediaUpload, PropertyImage, PropertyVideo
+
+STAGING_DIR = getattr(settings, "MEDIA_UPLOAD_STAGING_DIR", os.path.join(tempfile.gettempdir(), "media_uploads"))
+MAX_SIZE = getattr(settings, "MEDIA_UPLOAD_MAX_SIZE", 2 * 1024 ** 3)
+READ_SIZE = 1024 * 1024
+
+UPLOADING, COMPLETE, FAILED = "uploading", "complete", "failed"
+
+ATTACHMENTS = {
+    "image": (PropertyImage, "image"),
+    "video": (PropertyVideo, "video"),
+}
+
+
+class UploadError(Exception):
+    pass
+
+
+class OffsetMismatch(UploadError):
+    """
+    A chunk that does not start where the upload left off; `offset` is where it did.
+    """
+    def __init__(self, offset):
+        super().__init__(f"Expected a chunk starting at byte {offset}.")
+        self.offset = offset
+
+
+class StagedFile(File):
+    """
+    A complete staging file; storages that support it (FileSystemStorage)
+    move it into place instead of copying its content.
+    """
+    def __init__(self, path, name):
+        super().__init__(open(path, "rb"), name=name)
+        self._path = path
+
+    def temporary_file_path(self):
+        return self._path
+
+
+def staging_path(upload):
+    return os.path.join(STAGING_DIR, str(upload.pk))
+
+
+def start(upload):
+    os.makedirs(STAGING_DIR, exist_ok=True)
+    open(staging_path(upload), "wb").close()
+
+
+def append(upload, stream, start, length):
+    """
+    Write `length` bytes read from `stream` at byte `start` of the upload.
+    A client that disconnects mid-chunk keeps what was received. Completes
+    the upload when its last byte is written; returns the upload.
+
+    The upload row stays locked from the offset check until the new offset
+    (and, for the last chunk, the attachment) is saved, so of two racing
+    chunks for the same offset only the first touches the staging file.
+    """
+    failure = None
+    with transaction.atomic():
+        locked = MediaUpload.objects.select_for_update().get(pk=upload.pk)
+        upload.offset, upload.status = locked.offset, locked.status
+        if upload.status != UPLOADING:
+            raise UploadError(f"Upload is {upload.status}.")
+        if start != upload.offset:
+            raise OffsetMismatch(upload.offset)
+        if start + length > upload.size:
+            raise UploadError("Chunk runs past the declared upload size.")
+
+        path = staging_path(upload)
+        written = 0
+        with open(path, "r+b" if os.path.exists(path) else "wb") as fh:
+            fh.seek(start)
+            fh.truncate()
+            while written < length:
+                data = stream.read(min(READ_SIZE, length - written))
+                if not data:
+                    break
+                fh.write(data)
+                written += len(data)
+
+        upload.offset = start + written
+        MediaUpload.objects.filter(pk=upload.pk).update(offset=upload.offset, updated_at=timezone.now())
+        if upload.offset == upload.size:
+            try:
+                finalize(upload)
+            except Exception as exc:
+                # Raised after the block so the failed status is committed
+                failure = exc
+    if failure is not None:
+        raise failure
+    return upload
+
+
+def _verify_image(path):
+    try:
+        with Image.open(path) as picture:
+            picture.verify()
+    except Exception:
+        raise UploadError("Upload a valid image. The file you uploaded was either not an image or a corrupted image.")
+
+
+def finalize(upload):
+    """
+    Move the staging file into storage and attach it to the property. On
+    any failure the upload is marked failed, the staging file removed and
+    the stored file released, then the error is re-raised.
+    """
+    model, field_name = ATTACHMENTS[upload.kind]
+    path = staging_path(upload)
+    field = model._meta.get_field(field_name)
+    stored = None
+    try:
+        if upload.kind == "image":
+            _verify_image(path)
+        attachment = model(property=upload.property, caption=upload.caption)
+        name = field.generate_filename(attachment, upload.filename)
+        with StagedFile(path, name) as content:
+            stored = field.storage.save(name, content, max_length=field.max_length)
+        setattr(attachment, field_name, stored)
+
+        with transaction.atomic():
+            attachment.save()
+            upload.status = COMPLETE
+            upload.attachment_slug = attachment.slug
+            upload.save(update_fields=["status", "attachment_slug", "updated_at"])
+    except Exception:
+        if stored is not None:
+            field.storage.delete(stored)
+        upload.status = FAILED
+        MediaUpload.objects.filter(pk=upload.pk).update(status=FAILED, updated_at=timezone.now())
+        raise
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+    return attachment
+
+
+def get_attachment(upload):
+    if upload.status != COMPLETE:
+        return None
+    model, _ = ATTACHMENTS[upload.kind]
+    return model.objects.filter(slug=upload.attachment_slug).first()
+
+
+def discard(upload):
+    path = staging_path(upload)
+    if os.path.exists(path):
+        os.remove(path)
+    upload.delete()
+
+
+def purge_stale(max_age_hours=24):
+    """
+    Remove uploads untouched for `max_age_hours` (finished ones only lose
+    their record); returns how many were removed.
+    """
+    cutoff = timezone.now() - timedelta(hours=max_age_hours)
+    stale = list(MediaUpload.objects.filter(updated_at__lt=cutoff))
+    for upload in stale:
+        discard(upload)
+    return len(stale)
@@ -9,6 +9,7 @@ router.register('property-images', PropertyImageViewSet)
 router.register('property-amenities', PropertyAmenityViewSet)
 router.register('property-documents', PropertyDocumentViewSet)
 router.register('posted-properties', PostedPropertyViewSet)
+router.register('media-uploads', MediaUploadViewSet)
 
 urlpatterns = [
     path('api/', include(router.urls)),
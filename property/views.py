@@ -1,25 +1,97 @@
 from .models import *
 from .serializers import *
 from MBP.views import ProtectedModelViewSet
-from django.db.models import Avg, Count, Min, Max, Q
+from MBP.utils import aggregate_buckets
+from MBP.cache import cached_response
+from MBP.audit import audit_user
+from django.db.models import Avg, Count, Min, Max, Q, Sum, Prefetch, OuterRef, Subquery
+import io
+import math
+import re
 from rest_framework import status
+from rest_framework.exceptions import MethodNotAllowed
 from rest_framework.response import Response
 from rest_framework.decorators import action, permission_classes, api_view
 from datetime import timedelta
 from django.utils.timezone import now
+from django.core.files.storage import default_storage
 from rest_framework.decorators import api_view
 from .models import Property
 from .serializers import PropertySerializer
+from . import search, geo, uploads
 
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, SAFE_METHODS
 from rest_framework.response import Response
 
 
+def with_listing_relations(queryset):
+    """
+    Query plan for PropertySerializer: one query per nested relation instead
+    of five per property. FK columns are rendered from their raw ids, so no
+    joins are needed on the parent row.
+    """
+    return queryset.prefetch_related(
+        Prefetch("videos", queryset=PropertyVideo.objects.order_by("uploaded_at")),
+        Prefetch("images", queryset=PropertyImage.objects.order_by("-is_primary", "uploaded_at")),
+        Prefetch("amenities", queryset=PropertyAmenity.objects.order_by("id")),
+        Prefetch("documents", queryset=PropertyDocument.objects.select_related("ocr_job").order_by("id")),
+        Prefetch(
+            "contacts",
+            queryset=PropertyContact.objects.only(
+                "id", "property_id", "owner_name", "email", "phone_number", "slug", "created_at"
+            ),
+        ),
+    )
+
+
+def with_card_columns(queryset):
+    """
+    Query plan for PropertyCardSerializer: card columns only, the type name
+    joined in, and the primary (else oldest) image path and derivatives as
+    subqueries.
+    """
+    primary_images = (
+        PropertyImage.objects.filter(property=OuterRef("pk"))
+        .order_by("-is_primary", "uploaded_at")
+    )
+    return (
+        queryset.select_related("property_type")
+        .only(
+            "id", "slug", "title", "category", "property_status", "location", "price",
+            "price_per_sqft", "area_sqft", "bedrooms", "bathrooms", "ai_recommended_score",
+            "listed_on", "property_type__name",
+        )
+        .annotate(
+            primary_image=Subquery(primary_images.values("image")[:1]),
+            primary_image_derivatives=Subquery(primary_images.values("derivatives")[:1]),
+        )
+    )
+
+
 class PropertyViewSet(ProtectedModelViewSet):
     queryset = Property.objects.all().order_by('-listed_on')
     serializer_class = PropertySerializer
     model_name = "Property"
     lookup_field = "slug"
+    # Actions that always answer with PropertyCardSerializer (search results and
+    # home-page widgets); any other read can opt in with ?view=card
+    card_actions = ("search_properties", "ai_properties", "top_ai_properties", "top_ai_recommended")
+
+    def use_card_view(self):
+        if self.request.method not in SAFE_METHODS:
+            return False
+        return self.action in self.card_actions or self.request.query_params.get("view") == "card"
+
+    def get_serializer_class(self):
+        if self.use_card_view():
+            return PropertyCardSerializer
+        return super().get_serializer_class()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.use_card_view():
+            return with_card_columns(queryset)
+        return with_listing_relations(queryset)
     
     @action(detail=False, methods=["get"], url_path="search", permission_classes=[AllowAny])
     def search_properties(self, request):
@@ -27,6 +99,9 @@ class PropertyViewSet(ProtectedModelViewSet):
         Public API: Search properties by filters
         Example:
         /api/properties/search/?category=Sale&type=Apartment&status=Active&new_launch=true
+        /api/properties/search/?q=sea view gym&location=mumb
+        `q` is a ranked full-text search over title, description, location and
+        amenities; `q` and `location` both match word prefixes.
         """
         category = request.GET.get("category")              
         property_type = request.GET.get("type")             
@@ -37,8 +112,23 @@ class PropertyViewSet(ProtectedModelViewSet):
         bedrooms = request.GET.get("bedrooms")
         location = request.GET.get("location")
         new_launch = request.GET.get("new_launch")          
+        text = request.GET.get("q")
+
+        queryset = self.get_queryset()
 
-        queryset = Property.objects.all()
+        location_q = None
+        if location:
+            location_match = search.match_subquery(location, location_only=True)
+            location_q = Q(id__in=location_match) if location_match is not None else Q(location__icontains=location)
+
+        ranked_ids = None
+        text_q = None
+        if text:
+            ranked_ids = search.search_ids(text)
+            if ranked_ids is not None:
+                text_q = Q(id__in=ranked_ids)
+            else:
+                text_q = Q(title__icontains=text) | Q(description__icontains=text) | Q(location__icontains=text)
 
         # --- Exact match filters ---
         filters = {}
@@ -55,16 +145,17 @@ class PropertyViewSet(ProtectedModelViewSet):
         if min_price and max_price:
             filters["price__gte"] = min_price
             filters["price__lte"] = max_price
-        if location:
-            filters["location__icontains"] = location
         if new_launch and new_launch.lower() == "true":
             filters["listed_on__gte"] = now() - timedelta(days=30)
 
-        if filters:
-            queryset = queryset.filter(**filters)
+        conditions = [c for c in (location_q, text_q) if c is not None]
+        if filters or conditions:
+            queryset = queryset.filter(*conditions, **filters)
+
+        results = list(queryset)
 
         # --- Fallback OR search ---
-        if not queryset.exists() and filters:
+        if not results and (filters or conditions):
             q = Q()
             if category:
                 q |= Q(category=category)
@@ -78,33 +169,137 @@ class PropertyViewSet(ProtectedModelViewSet):
                 q |= Q(bedrooms=bedrooms)
             if min_price and max_price:
                 q |= Q(price__gte=min_price, price__lte=max_price)
-            if location:
-                q |= Q(location__icontains=location)
+            if location_q is not None:
+                q |= location_q
+            if text_q is not None:
+                q |= text_q
             if new_launch and new_launch.lower() == "true":
                 q |= Q(listed_on__gte=now() - timedelta(days=30))
 
-            queryset = Property.objects.filter(q)
+            results = list(self.get_queryset().filter(q))
 
-        serializer = self.get_serializer(queryset, many=True)
+        if ranked_ids:
+            rank = {property_id: position for position, property_id in enumerate(ranked_ids)}
+            results.sort(key=lambda prop: rank.get(prop.id, len(rank)))
+
+        serializer = self.get_serializer(results, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
     
+    @action(detail=False, methods=["get"], url_path="nearby", permission_classes=[AllowAny])
+    def nearby(self, request):
+        """
+        Public API: Properties near a point or inside a bounding box, nearest first.
+        Example:
+        /api/properties/nearby/?lat=19.07&lng=72.87&radius_km=5&category=Sale&bedrooms=2
+        /api/properties/nearby/?bbox=18.9,72.7,19.3,73.0&lat=19.07&lng=72.87
+        Accepts the category, type, status, furnishing, bedrooms and
+        min_price/max_price filters of /search/. `distance_km` is returned
+        when lat/lng are given.
+        """
+        params = request.query_params
+        try:
+            lat = float(params["lat"]) if params.get("lat") else None
+            lng = float(params["lng"]) if params.get("lng") else None
+            radius_km = float(params.get("radius_km", 5))
+            limit = max(1, min(int(params.get("limit", 50)), 200))
+            bbox = [float(v) for v in params["bbox"].split(",")] if params.get("bbox") else None
+        except ValueError:
+            return Response({"error": "lat, lng, radius_km, limit and bbox must be numeric."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # float() accepts nan/inf, which would never narrow down to a geohash prefix
+        values = [v for v in (lat, lng, radius_km, *(bbox or ())) if v is not None]
+        if not all(math.isfinite(v) for v in values) or radius_km <= 0:
+            return Response({"error": "lat, lng, radius_km and bbox must be finite, radius_km positive."}, status=status.HTTP_400_BAD_REQUEST)
+        radius_km = min(radius_km, 100.0)
+        if (lat is not None and not -90 <= lat <= 90) or (lng is not None and not -180 <= lng <= 180):
+            return Response({"error": "lat must be within [-90, 90] and lng within [-180, 180]."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if bbox is not None:
+            if len(bbox) != 4:
+                return Response({"error": "bbox must be min_lat,min_lng,max_lat,max_lng."}, status=status.HTTP_400_BAD_REQUEST)
+            min_lat, min_lng, max_lat, max_lng = bbox
+            if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lng <= max_lng <= 180):
+                return Response({"error": "bbox must be min_lat,min_lng,max_lat,max_lng within [-90, 90] and [-180, 180]."}, status=status.HTTP_400_BAD_REQUEST)
+        elif lat is not None and lng is not None:
+            min_lat, min_lng, max_lat, max_lng = geo.bounding_box(lat, lng, radius_km)
+        else:
+            return Response({"error": "Provide lat and lng, or bbox."}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.get_queryset().filter(
+            latitude__gte=min_lat, latitude__lte=max_lat,
+            longitude__gte=min_lng, longitude__lte=max_lng,
+        )
+        prefixes = geo.covering_prefixes(min_lat, min_lng, max_lat, max_lng)
+        if prefixes:
+            prefix_q = Q()
+            for prefix in prefixes:
+                prefix_q |= Q(geohash__startswith=prefix)
+            queryset = queryset.filter(prefix_q)
+
+        filters = {}
+        if params.get("category"):
+            filters["category"] = params["category"]
+        if params.get("type"):
+            filters["property_type__name__iexact"] = params["type"]
+        if params.get("status"):
+            filters["property_status"] = params["status"]
+        if params.get("furnishing"):
+            filters["furnishing"] = params["furnishing"]
+        if params.get("bedrooms"):
+            filters["bedrooms"] = params["bedrooms"]
+        if params.get("min_price"):
+            filters["price__gte"] = params["min_price"]
+        if params.get("max_price"):
+            filters["price__lte"] = params["max_price"]
+        queryset = queryset.filter(**filters)
+
+        if lat is None or lng is None:
+            serializer = self.get_serializer(queryset[:limit], many=True)
+            return Response(serializer.data, status=status.HTTP_200_OK)
+
+        # Rank the candidate set by exact distance; the geohash/box filter keeps it small.
+        candidates = queryset.values_list("id", "latitude", "longitude")
+        distances = {}
+        for property_id, prop_lat, prop_lng in candidates:
+            distance = geo.haversine_km(lat, lng, prop_lat, prop_lng)
+            if bbox is not None or distance <= radius_km:
+                distances[property_id] = distance
+        nearest = sorted(distances, key=distances.get)[:limit]
+
+        properties = sorted(self.get_queryset().filter(id__in=nearest), key=lambda prop: distances[prop.id])
+        data = self.get_serializer(properties, many=True).data
+        for item, prop in zip(data, properties):
+            item["distance_km"] = round(distances[prop.id], 3)
+        return Response(data, status=status.HTTP_200_OK)
+
     @action(detail=False, methods=['get'], url_path='stats')
     def stats(self, request):
-        qs = self.get_queryset()
+        # Read from the precomputed rollup (see property.rollups), not the Property table
+        totals = PropertyStatsRollup.objects.aggregate(
+            total=Sum('total_properties'),
+            price_sum=Sum('price_sum'),
+            area_sum=Sum('area_sum'),
+            active=Sum('total_properties', filter=Q(property_status='Active')),
+        )
+        total = totals['total'] or 0
         return Response({
-            'total_properties': qs.count(),
-            'average_price': qs.aggregate(Avg('price'))['price__avg'] or 0,
-            'average_area': qs.aggregate(Avg('area_sqft'))['area_sqft__avg'] or 0,
-            'active_count': qs.filter(property_status='Active').count(),
+            'total_properties': total,
+            'average_price': totals['price_sum'] / total if total else 0,
+            'average_area': totals['area_sum'] / total if total else 0,
+            'active_count': totals['active'] or 0,
         })
 
     @action(detail=False, methods=['get'], url_path='price-breakdown')
     def price_breakdown(self, request):
-        qs = self.get_queryset()
+        totals = PropertyStatsRollup.objects.aggregate(
+            below=Sum("price_below_20_lakh"),
+            between=Sum("price_20_50_lakh"),
+            above=Sum("price_above_50_lakh"),
+        )
         return Response({
-            "below_20_lakh": qs.filter(price__lt=2000000).count(),
-            "between_20_50_lakh": qs.filter(price__gte=2000000, price__lt=5000000).count(),
-            "above_50_lakh": qs.filter(price__gte=5000000).count(),
+            "below_20_lakh": totals["below"] or 0,
+            "between_20_50_lakh": totals["between"] or 0,
+            "above_50_lakh": totals["above"] or 0,
         })
 
     @action(detail=False, methods=['get'], url_path='top-ai-recommended')
@@ -114,10 +309,11 @@ class PropertyViewSet(ProtectedModelViewSet):
         return Response(serializer.data)
     
     @action(detail=False, methods=["get"], url_path="stats/location", permission_classes=[AllowAny])
+    @cached_response(timeout=300, tags=["property"])
     def stats_location(self, request):
         """
         Public API: Returns property counts, prices, and one image grouped by city.
-        City name is extracted from `location` field.
+        City is the indexed `Property.city` column, derived from `location` on save.
         Example Response:
         [
             {
@@ -131,54 +327,47 @@ class PropertyViewSet(ProtectedModelViewSet):
         ]
         """
 
-        properties = Property.objects.all()
-        city_data = {}
-
-        for prop in properties:
-            # Extract city (last part of location, strip spaces)
-            raw_location = prop.location or "Unknown"
-            parts = raw_location.split(",")
-            city = parts[-1].strip() if len(parts) > 1 else raw_location.strip()
-
-            if city not in city_data:
-                city_data[city] = {
-                    "city": city,
-                    "total_properties": 0,
-                    "prices": [],
-                    "image": None,
-                }
-
-            city_data[city]["total_properties"] += 1
-            city_data[city]["prices"].append(float(prop.price))
-
-            # Assign first image if not already set
-            if not city_data[city]["image"]:
-                first_image = prop.images.first()
-                if first_image and first_image.image:
-                    city_data[city]["image"] = request.build_absolute_uri(first_image.image.url)
-
-        # Format response
+        city_stats = (
+            Property.objects.values("city")
+            .annotate(
+                total_properties=Count("id"),
+                min_price=Min("price"),
+                max_price=Max("price"),
+                avg_price=Avg("price"),
+            )
+            .order_by("-total_properties", "city")
+        )
+
+        # One representative image path per city, in a single grouped query
+        images = dict(
+            PropertyImage.objects.exclude(image="")
+            .values("property__city")
+            .annotate(image=Min("image"))
+            .values_list("property__city", "image")
+        )
+
         formatted_data = []
-        for city, info in city_data.items():
-            prices = info["prices"]
+        for row in city_stats:
+            image = images.get(row["city"])
             formatted_data.append({
-                "city": city,
-                "total_properties": info["total_properties"],
-                # "min_price": min(prices) if prices else None,
-                # "max_price": max(prices) if prices else None,
-                # "avg_price": round(sum(prices) / len(prices), 2) if prices else None,
-                "image": info["image"]
+                "city": row["city"],
+                "total_properties": row["total_properties"],
+                "min_price": float(row["min_price"]) if row["min_price"] is not None else None,
+                "max_price": float(row["max_price"]) if row["max_price"] is not None else None,
+                "avg_price": round(float(row["avg_price"]), 2) if row["avg_price"] is not None else None,
+                "image": request.build_absolute_uri(default_storage.url(image)) if image else None,
             })
 
         return Response(formatted_data, status=status.HTTP_200_OK)
     
     @action(detail=False, methods=["get"], url_path="top-video-properties", permission_classes=[AllowAny])
+    @cached_response(timeout=120, tags=["property"])
     def top_video_properties(self, request):
         """
         Public API: Returns top 5 properties that have videos
         """
         properties = (
-            Property.objects.filter(videos__isnull=False)
+            self.get_queryset().filter(videos__isnull=False)
             .distinct()
             .order_by("-listed_on")[:5]
         )
@@ -186,6 +375,7 @@ class PropertyViewSet(ProtectedModelViewSet):
         return Response(serializer.data, status=status.HTTP_200_OK)
     
     @action(detail=False, methods=["get"], url_path="stats/property-type", permission_classes=[AllowAny])
+    @cached_response(timeout=300, tags=["property"])
     def stats_property_type(self, request):
         """
         Public API: Returns property counts grouped by property type.
@@ -197,14 +387,16 @@ class PropertyViewSet(ProtectedModelViewSet):
         ]
         """
         data = (
-            Property.objects
+            PropertyStatsRollup.objects
             .values("property_type__name")
-            .annotate(total_properties=Count("id"))
+            .annotate(total_properties=Sum("total_properties"))
+            .filter(total_properties__gt=0)
             .order_by("-total_properties")
         )
-        return Response(data, status=status.HTTP_200_OK)
+        return Response(list(data), status=status.HTTP_200_OK)
     
     @action(detail=False, methods=["get"], url_path="top-ai-properties", permission_classes=[AllowAny])
+    @cached_response(timeout=120, tags=["property"])
     def top_ai_properties(self, request):
         """
         Public API: Returns top 3 properties based on AI recommended score.
@@ -216,13 +408,14 @@ class PropertyViewSet(ProtectedModelViewSet):
         ]
         """
         properties = (
-            Property.objects.filter(property_status="Active", ai_recommended_score__isnull=False)
+            self.get_queryset().filter(property_status="Active", ai_recommended_score__isnull=False)
             .order_by("-ai_recommended_score")
         )
         serializer = self.get_serializer(properties, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
     
     @action(detail=False, methods=["get"], url_path="ai-properties", permission_classes=[AllowAny])
+    @cached_response(timeout=120, tags=["property"])
     def ai_properties(self, request):
         """
         Public API: Returns AI-ranked properties with optional filters.
@@ -236,7 +429,7 @@ class PropertyViewSet(ProtectedModelViewSet):
         limit = int(request.query_params.get("limit", 6))
         category = request.query_params.get("category", None)
 
-        qs = Property.objects.filter(property_status="Active", ai_recommended_score__isnull=False)
+        qs = self.get_queryset().filter(property_status="Active", ai_recommended_score__isnull=False)
 
         if category:
             qs = qs.filter(category=category)
@@ -254,29 +447,29 @@ class PropertyTypeViewSet(ProtectedModelViewSet):
 
 
 class PropertyImageViewSet(ProtectedModelViewSet):
-    queryset = PropertyImage.objects.all().order_by('-uploaded_at')
+    queryset = PropertyImage.objects.select_related('property').order_by('-uploaded_at')
     serializer_class = PropertyImageSerializer
     model_name = "PropertyImage"
     lookup_field = "slug"
 
 
 class PropertyAmenityViewSet(ProtectedModelViewSet):
-    queryset = PropertyAmenity.objects.all()
+    queryset = PropertyAmenity.objects.select_related('property')
     serializer_class = PropertyAmenitySerializer
     model_name = "PropertyAmenity"
     lookup_field = "slug"
 
 
 class PropertyDocumentViewSet(ProtectedModelViewSet):
-    queryset = PropertyDocument.objects.all()
+    queryset = PropertyDocument.objects.select_related('property', 'ocr_job')
     serializer_class = PropertyDocumentSerializer
     model_name = "PropertyDocument"
     lookup_field = "slug"
     
     @action(detail=False, methods=['get'], url_path='verification-rate')
     def verification_rate(self, request):
-        total = self.get_queryset().count()
-        verified = self.get_queryset().filter(verified=True).count()
+        counts = aggregate_buckets(self.get_queryset(), total=Q(), verified=Q(verified=True))
+        total, verified = counts["total"], counts["verified"]
         rate = round((verified / total) * 100, 2) if total else 0
         return Response({
             "total_documents": total,
@@ -292,3 +485,83 @@ class PostedPropertyViewSet(ProtectedModelViewSet):
     lookup_field = "slug"
 
 
+
+
+CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+|\*)$")
+
+
+class MediaUploadViewSet(ProtectedModelViewSet):
+    """
+    Resumable chunked uploads of property images and videos (see property.uploads):
+
+        POST /api/media-uploads/            {"property_slug": ..., "kind": "video", "filename": "tour.mp4", "size": 734003200}
+        PUT  /api/media-uploads/{id}/chunk/ Content-Range: bytes 0-8388607/734003200, raw bytes as the body
+        GET  /api/media-uploads/{id}/       current `offset` to resume from; `attachment` once complete
+    """
+    queryset = MediaUpload.objects.select_related('property').order_by('-created_at')
+    serializer_class = MediaUploadSerializer
+    model_name = "MediaUpload"
+    http_method_names = ['get', 'post', 'put', 'delete', 'head', 'options']
+
+    def get_permissions(self):
+        permissions = super().get_permissions()
+        if self.action == 'chunk':
+            self.permission_code = 'c'
+        return permissions
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if not self.request.user.is_superuser:
+            queryset = queryset.filter(owner=self.request.user)
+        return queryset
+
+    def perform_create(self, serializer):
+        serializer.save(owner=self.request.user)
+
+    def update(self, request, *args, **kwargs):
+        raise MethodNotAllowed(request.method)
+
+    def perform_destroy(self, instance):
+        uploads.discard(instance)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if isinstance(getattr(response, 'data', None), dict) and 'offset' in response.data:
+            response['Upload-Offset'] = response.data['offset']
+        return response
+
+    def _chunk_bounds(self, request, upload):
+        """
+        (start, length) of the chunk in the request body.
+        """
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+        content_range = request.headers.get('Content-Range')
+        if content_range:
+            match = CONTENT_RANGE_RE.match(content_range.strip())
+            if not match:
+                raise uploads.UploadError("Malformed Content-Range header.")
+            start, end, total = match.groups()
+            start, end = int(start), int(end)
+            if end < start or (total != '*' and int(total) != upload.size):
+                raise uploads.UploadError("Content-Range does not match the upload.")
+            if content_length != end - start + 1:
+                raise uploads.UploadError("Content-Length does not match Content-Range.")
+            return start, content_length
+        upload_offset = request.headers.get('Upload-Offset')
+        if upload_offset is None or not upload_offset.isdigit():
+            raise uploads.UploadError("Send a Content-Range or Upload-Offset header.")
+        return int(upload_offset), content_length
+
+    @action(detail=True, methods=['put'])
+    def chunk(self, request, pk=None):
+        upload = self.get_object()
+        try:
+            start, length = self._chunk_bounds(request, upload)
+            # Read the raw body; touching request.data would buffer the whole chunk
+            with audit_user(request.user):
+                uploads.append(upload, request.stream or io.BytesIO(), start, length)
+        except uploads.OffsetMismatch as exc:
+            return Response({"detail": str(exc), "offset": exc.offset}, status=status.HTTP_409_CONFLICT)
+        except uploads.UploadError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(upload).data)